@@ -0,0 +1,34 @@
+"""Measures memory taken by a tree of tasks
+
+Run from the repository root: ``python -m Benchmarks.memory_benchmark [task counts...]``
+"""
+import gc
+import sys
+import tracemalloc
+
+from .storage_benchmark import build_tree
+
+
+def measure_tree(task_count: int) -> int:
+    """Builds a tree of *task_count* tasks and returns the number of bytes it takes"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        root = build_tree(task_count)
+        root.find_subtask("Task number 1")  # Builds the root's index
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del root
+    return size
+
+
+def main(task_counts: list[int]):
+    print(f"{'tasks':>10} {'total, MiB':>12} {'per task, B':>12}")
+    for task_count in task_counts:
+        size = measure_tree(task_count)
+        print(f"{task_count:>10} {size / 2 ** 20:>12.1f} {size / task_count:>12.0f}")
+
+
+if __name__ == '__main__':
+    main([int(argument) for argument in sys.argv[1:]] or [100_000, 1_000_000])
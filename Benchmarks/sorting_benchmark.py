@@ -0,0 +1,74 @@
+"""Compares ordering siblings with cached sort keys and bisect against comparing tasks' priorities
+
+Run from the repository root: ``python -m Benchmarks.sorting_benchmark [sibling counts...]``
+"""
+import datetime
+import functools
+import random
+import sys
+import time
+
+from OutlinerApp.Backend.tasks import TaskNode
+
+from .storage_benchmark import IMPORTANCES, measure
+
+
+def make_tasks(count: int) -> list[TaskNode]:
+    random.seed(0)
+    today = datetime.date.today()
+    tasks = []
+    for task_id in range(1, count + 1):
+        deadline = today + datetime.timedelta(days=random.randint(-30, 300)) if random.random() < 0.3 else None
+        task = TaskNode(f"Task number {task_id}", deadline, random.choice(IMPORTANCES), task_id)
+        task._is_done = random.random() < 0.2
+        tasks.append(task)
+    return tasks
+
+
+def compare_priorities(first: TaskNode, second: TaskNode) -> int:
+    """Ordering used before sort keys were cached: every comparison recomputes both priorities"""
+    if first.priority == second.priority:
+        return -1 if first.text <= second.text else 1
+    return -1 if first.priority > second.priority else 1
+
+
+def insert_by_priority(children: list[TaskNode], task: TaskNode):
+    for index in range(len(children)):
+        if compare_priorities(task, children[index]) < 0:
+            children.insert(index, task)
+            return
+    children.append(task)
+
+
+def insert_all_by_priority(tasks: list[TaskNode]):
+    children = []
+    for task in tasks:
+        insert_by_priority(children, task)
+    return children
+
+
+def insert_all_with_keys(tasks: list[TaskNode]):
+    parent = TaskNode()
+    parent.id = 0
+    for task in tasks:
+        parent.insert_subtask(task)
+    return parent.child_nodes
+
+
+def main(counts: list[int]):
+    print(f"{'siblings':>10} {'method':>10} {'insert, s':>10} {'sort, s':>10}")
+    for count in counts:
+        tasks = make_tasks(count)
+        insert_time, _ = measure(insert_all_by_priority, tasks)
+        sort_time, _ = measure(lambda: sorted(tasks, key=functools.cmp_to_key(compare_priorities)))
+        print(f"{count:>10} {'compare':>10} {insert_time:>10.3f} {sort_time:>10.3f}")
+
+        tasks = make_tasks(count)
+        insert_time, children = measure(insert_all_with_keys, tasks)
+        random.shuffle(children)
+        sort_time, _ = measure(children[0].parent_node.sort_children)
+        print(f"{count:>10} {'keys':>10} {insert_time:>10.3f} {sort_time:>10.3f}")
+
+
+if __name__ == '__main__':
+    main([int(argument) for argument in sys.argv[1:]] or [1_000, 10_000])
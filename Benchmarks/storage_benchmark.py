@@ -0,0 +1,60 @@
+"""Compares the binary storage format with pickle
+
+Run from the repository root: ``python -m Benchmarks.storage_benchmark [task counts...]``
+"""
+import datetime
+import pickle
+import random
+import sys
+import time
+
+from OutlinerApp.Backend import storage
+from OutlinerApp.Backend.data import Importance
+from OutlinerApp.Backend.tasks import TaskNode
+
+IMPORTANCES = [Importance.TODO_A, Importance.TODO_B, Importance.TODO_C, Importance.DOING_B, Importance.WAITING_B]
+
+
+def build_tree(task_count: int, max_depth: int = 4) -> TaskNode:
+    random.seed(0)
+    root = TaskNode()
+    root.id = 0
+    parents = [root]
+    today = datetime.date.today()
+    for task_id in range(1, task_count + 1):
+        parent = random.choice(parents)
+        deadline = today + datetime.timedelta(days=random.randint(-30, 300)) if random.random() < 0.3 else None
+        task = TaskNode(f"Task number {task_id}", deadline, random.choice(IMPORTANCES), task_id)
+        task._is_done = random.random() < 0.2
+        parent.append_subtask(task)
+        root.allocate_id(task_id)
+        if task.ident_level < max_depth:
+            parents.append(task)
+    return root
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(task_counts: list[int]):
+    print(f"{'tasks':>10} {'format':>8} {'size, KiB':>12} {'save, s':>10} {'load, s':>10}")
+    for task_count in task_counts:
+        root = build_tree(task_count)
+        limit = sys.getrecursionlimit()
+        sys.setrecursionlimit(max(limit, 100000))
+        try:
+            pickle_save, pickled = measure(pickle.dumps, root)
+            pickle_load, _ = measure(pickle.loads, pickled)
+        finally:
+            sys.setrecursionlimit(limit)
+        binary_save, binary = measure(storage.dump_tasks, root)
+        binary_load, _ = measure(storage.load_tasks, binary)
+        print(f"{task_count:>10} {'pickle':>8} {len(pickled) / 1024:>12.0f} {pickle_save:>10.3f} {pickle_load:>10.3f}")
+        print(f"{task_count:>10} {'binary':>8} {len(binary) / 1024:>12.0f} {binary_save:>10.3f} {binary_load:>10.3f}")
+
+
+if __name__ == '__main__':
+    main([int(argument) for argument in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
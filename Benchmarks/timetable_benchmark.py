@@ -0,0 +1,84 @@
+"""Compares keeping day tables ordered with bisect against the linear insertion used before
+
+Run from the repository root: ``python -m Benchmarks.timetable_benchmark [event counts...]``
+"""
+import datetime
+import random
+import sys
+
+from OutlinerApp.Backend.timetables import Timetable, TimetableItem, TimetableTask
+
+from .storage_benchmark import measure
+
+
+def make_events(count: int, days: int, all_day_share: float) -> list[TimetableItem]:
+    random.seed(0)
+    start = datetime.date.today()
+    events = []
+    for index in range(count):
+        date = start + datetime.timedelta(days=random.randrange(days))
+        start_time = datetime.time(random.randrange(8, 20), random.choice((0, 15, 30, 45))) \
+            if random.random() >= all_day_share else None
+        events.append(TimetableItem(date, f"Meeting {index}", start_time=start_time))
+    return events
+
+
+def add_item_linearly(timetable: Timetable, new_item: TimetableItem):
+    """Insertion used before day tables were kept ordered by bisect, it stops at the first all-day item, so days
+    with all-day items are fast to fill, but end up out of order"""
+    if new_item.date in timetable.daytables_by_date.keys():
+        day_timetable = timetable.daytables_by_date[new_item.date]
+        if isinstance(new_item, TimetableTask):
+            day_timetable.append(new_item)
+            return
+        index = -1
+        for item in day_timetable:
+            index += 1
+            if new_item.start_time is None:
+                day_timetable.insert(0, new_item)
+                break
+            if item.start_time is None:
+                day_timetable.insert(index, new_item)
+                break
+            if item.start_time <= new_item.start_time:
+                continue
+            elif item.start_time >= new_item.start_time:
+                day_timetable.insert(index, new_item)
+                break
+        else:
+            day_timetable.append(new_item)
+    else:
+        timetable.daytables_by_date[new_item.date] = [new_item]
+
+
+def remove_all_by_equality(timetable: Timetable, events: list[TimetableItem]):
+    for event in events:
+        timetable.daytables_by_date[event.date].remove(event)
+
+
+def fill(add, events: list[TimetableItem]) -> Timetable:
+    timetable = Timetable()
+    for event in events:
+        add(timetable, event)
+    return timetable
+
+
+def main(counts: list[int]):
+    print(f"{'events':>10} {'days':>6} {'all-day':>8} {'method':>8} {'add, s':>10} {'remove, s':>10}")
+    for count in counts:
+        for days, all_day_share in ((3 * 365, 0.1), (30, 0.1), (30, 0)):
+            events = make_events(count, days, all_day_share)
+            removed = events[::10]
+
+            add_time, timetable = measure(fill, add_item_linearly, events)
+            remove_time, _ = measure(remove_all_by_equality, timetable, removed)
+            print(f"{count:>10} {days:>6} {all_day_share:>8.0%} {'linear':>8} {add_time:>10.3f} {remove_time:>10.3f}")
+
+            add_time, timetable = measure(fill, Timetable.add_item, events)
+            remove_time, _ = measure(lambda: [timetable.remove_item(event) for event in removed])
+            timetable.check_invariants()
+            print(f"{count:>10} {days:>6} {all_day_share:>8.0%} {'bisect':>8} {add_time:>10.3f} {remove_time:>10.3f}")
+
+
+if __name__ == '__main__':
+    main([int(argument) for argument in sys.argv[1:]] or [100_000])
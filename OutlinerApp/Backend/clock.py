@@ -0,0 +1,69 @@
+"""Current date, shared by everything that depends on it
+
+Values derived from the date (task priorities, sort keys, exclusions, counts) are cached until the day rolls over.
+``start`` schedules a check right after every midnight, which notifies subscribers once per new day, so they can
+invalidate their caches, re-sort and redraw
+"""
+import datetime
+import threading
+
+_today: datetime.date = datetime.date.today()
+_epoch: int = 0
+_subscribers: list = []
+_timer: threading.Timer | None = None
+_lock = threading.Lock()
+
+
+def today() -> datetime.date:
+    """Returns the current date, without asking the OS for it"""
+    return _today
+
+
+def epoch() -> int:
+    """Number of times the day has rolled over since the app was started"""
+    return _epoch
+
+
+def subscribe(callback):
+    """Registers *callback* to be called with the new date every time the day rolls over"""
+    _subscribers.append(callback)
+
+
+def check(now: datetime.date = None) -> bool:
+    """Checks if the day has rolled over, notifies subscribers if it has
+    :arg now: current date, asked from the OS if not given
+    :returns: ``True`` if the day has rolled over
+    """
+    global _today
+    global _epoch
+    if now is None:
+        now = datetime.date.today()
+    with _lock:
+        if now == _today:
+            return False
+        _today = now
+        _epoch += 1
+    for callback in _subscribers:
+        callback(now)
+    return True
+
+
+def start():
+    """Starts checking for the day rolling over right after every midnight"""
+    global _timer
+    stop()
+    now = datetime.datetime.now()
+    midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time())
+    _timer = threading.Timer((midnight - now).total_seconds() + 1, _on_timer)
+    _timer.daemon = True
+    _timer.start()
+
+
+def stop():
+    if _timer is not None:
+        _timer.cancel()
+
+
+def _on_timer():
+    check()
+    start()
@@ -5,6 +5,7 @@ from dataclasses import dataclass
 from pathlib import Path
 
 from . import data
+from .query import Query, parse_query
 
 
 @dataclass
@@ -13,6 +14,13 @@ class _IO:
     tasks_file: Path = Path("~/ProgrammingProjects/PycharmProjects/TUICalendar/tasks.pkl").expanduser()
     calcure_file: Path = Path("~/.config/calcure/tasks.csv").expanduser()
     event_file: Path = Path("~/ProgrammingProjects/PycharmProjects/TUICalendar/events.pkl").expanduser()
+    journal_file: Path = Path("~/ProgrammingProjects/PycharmProjects/TUICalendar/tasks.journal").expanduser()
+    storage_backend: str = "files"
+    database_file: Path = Path("~/ProgrammingProjects/PycharmProjects/TUICalendar/outliner.sqlite").expanduser()
+    journal_threshold: int = 256 * 1024
+    write_delay: float = 0.5
+    fsync_policy: str = "snapshots"
+    reload_delay: float = 0.3
 
 
 @dataclass
@@ -20,6 +28,7 @@ class _Task:
     tab_string: str = "  "
     exclude_tasks: list[data.Importance] = dataclasses.field(default_factory=lambda: [data.Importance.DONE])
     keywords: tuple = ("TODO", "DOING", "DONE", "WAITING")
+    views: dict[str, Query] = dataclasses.field(default_factory=dict)
 
 
 @dataclass
@@ -196,6 +205,19 @@ class ConfigManager:
             calcure_file = Path(parser.get(section, "calcure_file")).expanduser().resolve()
         except configparser.NoOptionError:
             pass
+        journal_file = tasks_file.with_suffix(".journal")
+        try:
+            journal_file = Path(parser.get(section, "journal_file")).expanduser().resolve()
+        except configparser.NoOptionError:
+            pass
+        storage_backend = parser.get(section, "storage_backend", fallback="files").lower()
+        if storage_backend not in ("files", "sqlite"):
+            raise RuntimeError(storage_backend + " is not a valid storage_backend")
+        database_file = tasks_file.with_suffix(".sqlite")
+        try:
+            database_file = Path(parser.get(section, "database_file")).expanduser().resolve()
+        except configparser.NoOptionError:
+            pass
 
         if not logseq_dir.exists():
             raise RuntimeError(str(logseq_dir) + " does not exist")
@@ -212,6 +234,31 @@ class ConfigManager:
         self.IOConfig.tasks_file = tasks_file
         self.IOConfig.calcure_file = calcure_file
         self.IOConfig.event_file = event_file
+        self.IOConfig.journal_file = journal_file
+        self.IOConfig.storage_backend = storage_backend
+        self.IOConfig.database_file = database_file
+
+        # Storage
+        section = "Storage"
+        if parser.has_section(section):
+            self.IOConfig.journal_threshold = parser.getint(section, "journal_threshold",
+                                                            fallback=self.IOConfig.journal_threshold)
+            self.IOConfig.write_delay = parser.getfloat(section, "write_delay", fallback=self.IOConfig.write_delay)
+            self.IOConfig.fsync_policy = parser.get(section, "fsync_policy", fallback=self.IOConfig.fsync_policy).lower()
+            if self.IOConfig.fsync_policy not in ("always", "snapshots", "never"):
+                raise RuntimeError(self.IOConfig.fsync_policy + " is not a valid fsync_policy")
+            self.IOConfig.reload_delay = parser.getfloat(section, "reload_delay", fallback=self.IOConfig.reload_delay)
+
+        # Views
+        section = "Views"
+        if parser.has_section(section):
+            views = {}
+            for name in parser.options(section):
+                try:
+                    views[name] = parse_query(parser.get(section, name))
+                except ValueError as error:
+                    raise RuntimeError(f"{name} is not a valid view: {error}")
+            self.TaskConfig.views = views
 
         # Icons
         section = "Icons"
@@ -2,6 +2,7 @@ import enum
 
 from dataclasses import dataclass
 from pathlib import Path
+from typing import NamedTuple
 
 
 class Importance(enum.IntEnum):
@@ -32,6 +33,38 @@ class Importance(enum.IntEnum):
                 return "DOING"
 
 
+class ChangeKind(enum.Enum):
+    INSERTED = "inserted"
+    REMOVED = "removed"
+    CHANGED = "changed"
+    RELOADED = "reloaded"
+
+
+@dataclass
+class TaskChange:
+    """Describes a change made to the tree of tasks
+
+    *parent* is the task's parent at the moment of the change, ``RELOADED`` changes have neither task nor parent
+    """
+    kind: ChangeKind
+    task: "TaskNode" = None
+    parent: "TaskNode" = None
+
+
+class TaskCounts(NamedTuple):
+    """Numbers of tasks in a subtree, see ``TaskNode.counts``"""
+    total: int = 0
+    done: int = 0
+    excluded: int = 0
+    overdue: int = 0
+
+    def __add__(self, other):
+        return TaskCounts(self[0] + other[0], self[1] + other[1], self[2] + other[2], self[3] + other[3])
+
+    def __sub__(self, other):
+        return TaskCounts(self[0] - other[0], self[1] - other[1], self[2] - other[2], self[3] - other[3])
+
+
 @dataclass
 class TaskOrigin:
     file: Path
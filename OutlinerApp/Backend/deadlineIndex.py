@@ -0,0 +1,53 @@
+"""Index of tasks by their deadlines, answers date-range queries without walking the tree of tasks"""
+import bisect
+import datetime
+
+
+class DeadlineIndex:
+    """Tasks grouped by their deadlines, with the deadlines kept sorted
+
+    Queries take O(log d + result) time, where d is the number of distinct deadlines. Tasks due on the same day are
+    kept in the order they were indexed in
+    """
+    __slots__ = ("_dates", "_tasks")
+
+    def __init__(self):
+        self._dates: list[datetime.date] = []
+        self._tasks: dict[datetime.date, list] = {}
+
+    def add(self, task):
+        """Indexes *task* by its current deadline, tasks without a deadline are ignored"""
+        if task.deadline is None:
+            return
+        tasks = self._tasks.get(task.deadline)
+        if tasks is None:
+            bisect.insort(self._dates, task.deadline)
+            tasks = self._tasks[task.deadline] = []
+        tasks.append(task)
+
+    def remove(self, task, deadline: datetime.date | None):
+        """Removes *task* indexed by *deadline*, which may differ from its current deadline if it is being changed"""
+        tasks = self._tasks.get(deadline)
+        if tasks is None:
+            return
+        for index in range(len(tasks)):
+            if tasks[index] is task:
+                del tasks[index]
+                break
+        if len(tasks) == 0:
+            del self._tasks[deadline]
+            del self._dates[bisect.bisect_left(self._dates, deadline)]
+
+    def due_on(self, day: datetime.date) -> list:
+        """Returns tasks due on *day*"""
+        return list(self._tasks.get(day, ()))
+
+    def due_between(self, start: datetime.date | None, end: datetime.date | None):
+        """Lazily yields tasks due from *start* to *end* (both inclusive), ordered by their deadlines
+        :arg start: first day, ``None`` for no lower bound
+        :arg end: last day, ``None`` for no upper bound
+        """
+        first = 0 if start is None else bisect.bisect_left(self._dates, start)
+        last = len(self._dates) if end is None else bisect.bisect_right(self._dates, end)
+        for day in self._dates[first:last]:
+            yield from self._tasks[day]
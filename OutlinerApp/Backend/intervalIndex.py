@@ -0,0 +1,125 @@
+"""Index of the time intervals of a day's items, answers overlap queries without comparing every pair of items"""
+import itertools
+import random
+
+# Interval: (start, end, item), start and end are seconds since midnight, end is exclusive
+Interval = tuple[float, float, object]
+
+# Length given to momentary items, so they overlap the intervals they start in, but end before the next second
+MOMENT = 0.5
+
+
+class _Node:
+    """Node of a treap ordered by the starts of the intervals, which also keeps the latest end in its subtree"""
+    __slots__ = ("key", "interval", "priority", "left", "right", "max_end")
+
+    def __init__(self, key: tuple, interval: Interval):
+        self.key = key
+        self.interval = interval
+        self.priority = random.random()
+        self.left: _Node | None = None
+        self.right: _Node | None = None
+        self.max_end = interval[1]
+
+    def update(self):
+        self.max_end = self.interval[1]
+        if self.left is not None and self.left.max_end > self.max_end:
+            self.max_end = self.left.max_end
+        if self.right is not None and self.right.max_end > self.max_end:
+            self.max_end = self.right.max_end
+
+
+def _split(node: _Node | None, key: tuple) -> tuple[_Node | None, _Node | None]:
+    """Splits the subtree of *node* into nodes with keys less than *key* and the rest"""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        node.update()
+        return node, right
+    left, node.left = _split(node.left, key)
+    node.update()
+    return left, node
+
+
+def _merge(left: _Node | None, right: _Node | None) -> _Node | None:
+    """Merges two subtrees, all keys of *left* are less than the keys of *right*"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        left.update()
+        return left
+    right.left = _merge(left, right.left)
+    right.update()
+    return right
+
+
+class IntervalIndex:
+    """Intervals of a day's items in a treap (a randomly balanced search tree) ordered by their starts, where every node
+    also keeps the latest end in its subtree
+
+    Intervals are added and removed in O(log n) expected time, so the index is kept up to date as the day changes.
+    Overlap queries skip subtrees which end too early or start too late, and take O(log n) time per found interval
+    """
+    __slots__ = ("_root", "_keys", "_serials")
+
+    def __init__(self, intervals: list[Interval] = ()):
+        self._root: _Node | None = None
+        # Keys of the intervals by the ids of their items, an item has at most one interval a day
+        self._keys: dict[int, tuple] = {}
+        self._serials = itertools.count()
+        for interval in intervals:
+            self.add(interval)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, interval: Interval):
+        key = interval[0], interval[1], next(self._serials)
+        self._keys[id(interval[2])] = key
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key, interval)), right)
+
+    def remove(self, item) -> bool:
+        """Removes the interval of *item*
+        :returns: ``False`` if the item has no interval in the index
+        """
+        key = self._keys.pop(id(item), None)
+        if key is None:
+            return False
+        left, right = _split(self._root, key)
+        node, right = _split(right, (key[0], key[1], key[2] + 1))
+        self._root = _merge(left, right)
+        return True
+
+    def _search(self, start: float, end: float, from_end: bool) -> list[Interval]:
+        """Returns intervals, which end after *start*, and start before *end* (or at it if *from_end*), ordered by
+        their starts"""
+        found = []
+        stack = []
+        node = self._root
+        while len(stack) > 0 or node is not None:
+            if node is not None and node.max_end > start:
+                stack.append(node)
+                node = node.left
+                continue
+            if len(stack) == 0:
+                break
+            node = stack.pop()
+            if node.interval[0] > end or node.interval[0] == end and not from_end:
+                break
+            if node.interval[1] > start:
+                found.append(node.interval)
+            node = node.right
+        return found
+
+    def containing(self, point: float) -> list[Interval]:
+        """Returns intervals, which start at or before *point* and end after it"""
+        return self._search(point, point, True)
+
+    def overlapping(self, start: float, end: float) -> list[Interval]:
+        """Returns intervals overlapping the interval from *start* to *end* (exclusive), ordered by their starts"""
+        return self._search(start, end, False)
@@ -1,102 +1,194 @@
 #!/usr/bin/python3
+import atexit
+import concurrent.futures
+import contextlib
 import datetime
-import pickle
+import os
+import threading
+from pathlib import Path
 from typing import overload
 
+from ..Backend import clock
 from ..Backend.configs import session_config
+from ..Backend.data import ChangeKind, TaskChange
+from ..Backend import storage
+from ..Backend.journal import Journal
+from ..Backend.persistence import PersistenceThread, replace_files
+from ..Backend.sqliteStore import SqliteStore
 from ..Backend.tasks import TaskNode
-from ..Backend.timetables import Timetable, TimetableItem
+from ..Backend.timetables import Timetable, TimetableItem, TimetableTask
 
 _root_task: TaskNode | None = None
 _timetable: Timetable | None = None
 
+_journal: Journal | SqliteStore | None = None
+_pending: list = []
+_transaction: list[tuple] | None = None
+_lock = threading.RLock()
+_replaying = False
+_persistence: PersistenceThread | None = None
+
+TASKS = "tasks"
+EVENTS = "events"
+_dirty: set[str] = set()
+skipped_writes = 0
+"""Number of snapshot writes avoided, because the store has not changed since its last snapshot"""
+
+_own_writes: dict[Path, tuple | None] = {}
+_subscribers: list = []
+_loaded = threading.Event()
+_loader: threading.Thread | None = None
+# Error raised while loading the data in the background, see load_data_in_background
+load_error: Exception | None = None
+
 
 def get_root_task():
+    """Returns the root of the tree of tasks, waits for the data to load if it is being loaded in the background"""
     global _root_task
-    if _root_task is None:
-        load_tasks()
+    _wait_for_loader()
+    with _lock:
+        if _root_task is None:
+            load_data()
     return _root_task
 
 
 def get_timetable():
+    """Returns the timetable, waits for the data to load if it is being loaded in the background"""
     global _timetable
-    if _timetable is None:
-        load_events()
+    _wait_for_loader()
+    with _lock:
         if _timetable is None:
-            raise RuntimeError()
+            load_data()
+            if _timetable is None:
+                raise RuntimeError()
     return _timetable
 
 
+def is_loaded() -> bool:
+    """``True`` once the data has been loaded, i.e. ``get_root_task`` and ``get_timetable`` will not block"""
+    return _loaded.is_set()
+
+
 def add_subtask(subtask: TaskNode, root = _root_task):
     global _root_task
     global _timetable
-    if root is None:
-        load_tasks()
-        root = _root_task
-    root.add_subtask(subtask)
-    if subtask.deadline is not None:
-        _timetable.add_item(TimetableItem.from_task_with_deadline(subtask))
-        dump_timetable()
-    dump_tasks()
+    _wait_for_loader()
+    with _lock:
+        if root is None:
+            root = get_root_task()
+        if not root.add_subtask(subtask):
+            return
+        _mark_dirty(TASKS)
+        if subtask.deadline is not None:
+            _timetable.add_item(TimetableItem.from_task_with_deadline(subtask))
+            _mark_dirty(EVENTS)
+        _record("add_subtask", root.id, subtask.id, subtask.text, subtask.deadline, subtask._importance)
+        _notify(TaskChange(ChangeKind.INSERTED, subtask, root))
 
 
 def mark_done(task: TaskNode):
-    tt = _timetable.find_item(task)
-    if tt is not None:
-        tt.task.toggle_done()
-    if tt.__repr__() != task.__repr__():
-        task.toggle_done()
-    dump_timetable()
-    dump_tasks()
+    """Toggles *task*'s done status, together with its subtasks"""
+    set_done([task], not task.is_done)
+
+
+def set_done(tasks: list[TaskNode], is_done: bool = True):
+    """Marks *tasks* and their subtasks as done (or not done) in bulk: each affected parent is re-sorted once and
+    the change is persisted as a single record, deadline entries of the timetable refer to the same tasks
+    """
+    _wait_for_loader()
+    with _lock:
+        changed = TaskNode.set_done_many(tasks, is_done)
+        if len(changed) == 0:
+            return
+        _mark_dirty(TASKS)
+        # Subtrees of the topmost changed tasks hold all the changes, tasks which were already done (or not) are left out
+        changed_ids = {id(task) for task in changed}
+        tops = [task for task in changed if id(task.parent_node) not in changed_ids]
+        _record("set_done", [task.id for task in tops], is_done)
+        _notify(*(TaskChange(ChangeKind.CHANGED, task, task.parent_node) for task in tops))
 
 
 def edit_event(event: TimetableItem, new_event: TimetableItem):
-    if event.date!= new_event.date:
-        _timetable.move_item(event,new_event.date)
-    event.name = new_event.name
-    event.start_time = new_event.start_time
-    dump_timetable()
+    _wait_for_loader()
+    with _lock:
+        # The item is taken out of its day's table while it changes, to keep the table ordered
+        removed = _timetable.remove_item(event) is not None
+        event.date = new_event.date
+        event.name = new_event.name
+        # Events keep their durations when moved
+        duration = event.duration
+        event.start_time = new_event.start_time
+        event.end_time = new_event.start_time
+        if duration is not None and event.start_time is not None:
+            event.end_time = (datetime.datetime.combine(event.date, event.start_time) + duration).time()
+        if removed:
+            _timetable.add_item(event)
+        _mark_dirty(EVENTS)
+        _record("edit_event", event.TID, event.date, event.name, event.start_time, event.end_time)
     return event
 
 
 def edit_task(task: TaskNode, new_text=None, new_deadline=None):
-    if isinstance(new_text, str):
-        tt = _timetable.find_item(task)
-        task.text = new_text
-        if tt is not None:
-            tt.task = task
-            tt.name = tt.task.text
-    if isinstance(new_deadline,datetime.date) or new_deadline=="":
-        if new_deadline == "":
-            new_deadline = None
-        if task.deadline is not None:
-            _timetable.remove_item(TimetableItem.from_task_with_deadline(task))
-        task.deadline = new_deadline
-        if new_deadline is not None:
-            _timetable.add_item(TimetableItem.from_task_with_deadline(task))
-    dump_timetable()
-    dump_tasks()
+    _wait_for_loader()
+    with _lock:
+        record_args = task.id, new_text, new_deadline
+        if isinstance(new_text, str):
+            tt = _timetable.find_item(task)
+            task.text = new_text
+            _mark_dirty(TASKS)
+            if tt is not None:
+                tt.task = task
+                tt.name = tt.task.text
+                _mark_dirty(EVENTS)
+        if isinstance(new_deadline,datetime.date) or new_deadline=="":
+            if new_deadline == "":
+                new_deadline = None
+            tt = _timetable.find_item(task)
+            task.deadline = new_deadline
+            task.update_cached_values()
+            _mark_dirty(TASKS)
+            if tt is not None and new_deadline is not None:
+                _timetable.move_item(tt, new_deadline)
+            elif tt is not None:
+                _timetable.remove_item(tt)
+            elif new_deadline is not None:
+                _timetable.add_item(TimetableItem.from_task_with_deadline(task))
+            if tt is not None or new_deadline is not None:
+                _mark_dirty(EVENTS)
+        if task.parent_node is not None:
+            task.parent_node.reposition_subtask(task)
+        _record("edit_task", *record_args)
+        _notify(TaskChange(ChangeKind.CHANGED, task, task.parent_node))
     return task
 
 
 def remove_task(task: TaskNode):
     global _root_task
     global _timetable
-    task.remove()
-    try:
-        if task.deadline is not None:
-            _timetable.remove_item(TimetableItem.from_task_with_deadline(task))
-            dump_timetable()
-    except ValueError:
-        pass
-    dump_tasks()
+    _wait_for_loader()
+    with _lock:
+        task.remove()
+        _mark_dirty(TASKS)
+        # Deadlines of the removed subtasks are taken off the calendar as well
+        for node in task.iter_subtree(skip_excluded=False, with_deadline_only=True):
+            tt = _timetable.find_item(node)
+            if tt is not None:
+                _timetable.remove_item(tt)
+                _mark_dirty(EVENTS)
+        _record("remove_task", task.id)
+        _notify(TaskChange(ChangeKind.REMOVED, task, task.parent_node))
 
 
 def add_to_timetable(item: TimetableItem):
     global _root_task
     global _timetable
-    _timetable.add_item(item)
-    dump_timetable()
+    _wait_for_loader()
+    with _lock:
+        _timetable.add_item(item)
+        _mark_dirty(EVENTS)
+        task_id = item.task.id if isinstance(item, TimetableTask) and item.task is not None else None
+        _record("add_to_timetable", item.TID, item.date, item.name, item.start_time, item.end_time, item.location,
+                item.description, task_id)
 
 @overload
 def remove_from_timetable(item: TimetableItem):
@@ -107,47 +199,489 @@ def remove_from_timetable(date: datetime.date, num: int):
     ...
 
 def remove_from_timetable(*args):
+    """Removes an event from the timetable, deadline entries of tasks are not removed, they follow the deadlines of
+    their tasks"""
+    global _root_task
+    global _timetable
+    _wait_for_loader()
+    with _lock:
+        item = None
+        if len(args) == 2 and isinstance(args[0], datetime.date) and isinstance(args[1], int):
+            item = _timetable.find_item(args[0], args[1])
+        if len(args) == 1 and isinstance(args[0], TimetableItem):
+            item = args[0]
+        if isinstance(item, TimetableTask):
+            return
+        if item is not None and _timetable.remove_item(item) is not None:
+            _mark_dirty(EVENTS)
+            _record("remove_from_timetable", item.TID)
+
+
+@contextlib.contextmanager
+def transaction():
+    """Groups all operations made inside the ``with`` block into a single journal record,
+    so they are written to disk (or lost in a crash) together
+
+    Nested transactions become a part of the outermost one. If the block raises, operations already applied to the data
+    are still recorded, so the files match the data in memory
+    """
+    global _transaction
+    _wait_for_loader()
+    with _lock:
+        if _transaction is not None:
+            yield
+            return
+        _transaction = []
+        try:
+            yield
+        finally:
+            records, _transaction = _transaction, None
+            if len(records) > 0:
+                _record("transaction", records)
+
+
+def subscribe(callback):
+    """Registers *callback* to be called with a list of ``TaskChange`` every time the tasks are changed"""
+    _subscribers.append(callback)
+
+
+def _notify(*changes: TaskChange):
+    if _replaying or len(changes) == 0:
+        return
+    for callback in _subscribers:
+        callback(list(changes))
+
+
+def _on_day_changed(today: datetime.date):
+    """Re-sorts the tree of tasks and recounts tasks once, because priorities and exclusions depend on the date"""
+    with _lock:
+        if _root_task is None:
+            return
+        for node in _root_task.iter_subtree(skip_excluded=False):
+            if len(node.child_nodes) > 1:
+                node.sort_children()
+        _root_task.refresh_counts()
+    _notify(TaskChange(ChangeKind.RELOADED))
+
+
+clock.subscribe(_on_day_changed)
+
+
+def _mark_dirty(store: str):
+    """Marks *store* (``TASKS`` or ``EVENTS``) as changed since its last snapshot"""
+    _dirty.add(store)
+
+
+def _record(operation: str, *args):
+    """Queues an operation to be appended to the journal by the persistence thread"""
+    global _persistence
+    if _replaying:
+        return
+    if _transaction is not None:
+        _transaction.append((operation, args))
+        return
+    _pending.append(_journal.make_record(operation, *args))
+    if _persistence is None or not _persistence.is_alive:
+        _persistence = PersistenceThread(flush, session_config.IOConfig.write_delay)
+        _persistence.start()
+    _persistence.request()
+
+
+def flush():
+    """Immediately writes all pending operations to the journal (or the database),
+    compacts the journal into a fresh snapshot if it has outgrown the threshold"""
+    with _lock:
+        if len(_pending) == 0:
+            return
+        _journal.write(_pending)
+        _remember_write(_journal.path)
+        _pending.clear()
+        if isinstance(_journal, Journal) and _journal.size > session_config.IOConfig.journal_threshold:
+            compact()
+
+
+def _replay(operation: str, args: tuple):
+    """Repeats an operation, that was read from the journal
+
+    Operations on tasks or events which do not exist (any more) are skipped, so a journal which does not match the
+    snapshots exactly can still be loaded
+    """
+    match operation:
+        case "add_subtask":
+            parent_id, task_id, text, deadline, importance = args
+            parent = _root_task.find_by_id(parent_id)
+            if parent is not None and _root_task.find_by_id(task_id) is None:
+                add_subtask(TaskNode(text, deadline, importance, task_id), parent)
+        case "mark_done":
+            task = _root_task.find_by_id(args[0])
+            if task is not None:
+                mark_done(task)
+        case "set_done":
+            task_ids, is_done = args
+            tasks = [_root_task.find_by_id(task_id) for task_id in task_ids]
+            set_done([task for task in tasks if task is not None], is_done)
+        case "edit_task":
+            task_id, new_text, new_deadline = args
+            task = _root_task.find_by_id(task_id)
+            if task is not None:
+                edit_task(task, new_text, new_deadline)
+        case "remove_task":
+            task = _root_task.find_by_id(args[0])
+            if task is not None:
+                remove_task(task)
+        case "edit_event":
+            # The end time is recomputed from the duration, records written by older versions do not have it
+            tid, new_date, name, start_time = args[:4]
+            event = _timetable.find_by_tid(tid)
+            if event is not None:
+                edit_event(event, TimetableItem(date=new_date, name=name, start_time=start_time))
+        case "add_to_timetable":
+            # Records written by older versions hold the item itself
+            item = args[0] if isinstance(args[0], TimetableItem) else _item_from_record(*args)
+            if item is not None and _timetable.find_by_tid(item.TID) is None:
+                add_to_timetable(item)
+        case "remove_from_timetable":
+            event = _timetable.find_by_tid(args[0])
+            if event is not None:
+                remove_from_timetable(event)
+        case "transaction":
+            for sub_operation, sub_args in args[0]:
+                _replay(sub_operation, sub_args)
+
+
+def _item_from_record(tid, date, name, start_time, end_time, location, description, task_id) -> TimetableItem | None:
+    """Recreates an item from the fields of an ``add_to_timetable`` record, ``None`` if its task does not exist"""
+    if task_id is None:
+        return TimetableItem(date, name, tid, location, description, start_time, end_time)
+    task = _root_task.find_by_id(task_id)
+    if task is None:
+        return None
+    return TimetableTask(date, name, tid, location, description, start_time, end_time, task=task)
+
+
+def compact():
+    """Writes a fresh snapshot of tasks and events (including pending operations) and truncates the journal
+
+    Stores which have not changed since their last snapshot are not rewritten. Does nothing if the data is stored in
+    a database, which is always up to date after ``flush``
+    """
+    global skipped_writes
+    with _lock:
+        if not isinstance(_journal, Journal):
+            flush()
+            return
+        contents = {}
+        if EVENTS in _dirty:
+            _timetable.journal_seq = _journal.seq
+            contents[session_config.IOConfig.event_file] = storage.dump_timetable(_timetable)
+        else:
+            skipped_writes += 1
+        if TASKS in _dirty:
+            _root_task.journal_seq = _journal.seq
+            contents[session_config.IOConfig.tasks_file] = storage.dump_tasks(_root_task)
+        else:
+            skipped_writes += 1
+        _replace_files(contents)
+        _journal.truncate()
+        _remember_write(_journal.path)
+        _pending.clear()
+        _dirty.clear()
+
+
+atexit.register(flush)
+
+
+def _replace_files(contents: dict[Path, bytes]):
+    with _lock:
+        replace_files(contents, fsync=session_config.IOConfig.fsync_policy != "never")
+        for path in contents:
+            _remember_write(path)
+
+
+def _fingerprint(path: Path) -> tuple | None:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def _remember_write(path: Path):
+    """Remembers the state of a file this process has just written, see ``is_own_write``"""
+    _own_writes[Path(path)] = _fingerprint(path)
+
+
+def is_own_write(path) -> bool:
+    """``True`` if the file at *path* is exactly in the state this process has last left it in,
+    i.e. a change to it was not made by another program"""
+    path = Path(path)
+    with _lock:
+        return path in _own_writes and _own_writes[path] == _fingerprint(path)
+
+
+def data_files() -> tuple[Path, ...]:
+    """Paths of all files the data is stored in"""
+    if session_config.IOConfig.storage_backend == "sqlite":
+        return session_config.IOConfig.database_file,
+    return (session_config.IOConfig.tasks_file,
+            session_config.IOConfig.event_file,
+            session_config.IOConfig.journal_file)
+
+
+def load_data():
+    """Loads snapshots of tasks and events, then replays the journal on top of them"""
+    with _lock:
+        _load()
+        _loaded.set()
+    _notify(TaskChange(ChangeKind.RELOADED))
+
+
+def load_data_in_background() -> threading.Thread:
+    """Starts loading the data on a separate thread, subscribers are notified with ``RELOADED`` once it is loaded
+
+    Until then ``is_loaded`` returns ``False`` and ``get_root_task``/``get_timetable`` block
+    """
+    global _loader
+    global load_error
+    _loaded.clear()
+    load_error = None
+    _loader = threading.Thread(target=_load_in_background, name="DataLoader", daemon=True)
+    _loader.start()
+    return _loader
+
+
+def _load_in_background():
+    """Loads the data, an error is kept in ``load_error`` for the main thread to report, subscribers are notified with
+    ``RELOADED`` either way, so they stop waiting"""
+    global load_error
+    try:
+        load_data()
+    except Exception as error:
+        load_error = error
+        _notify(TaskChange(ChangeKind.RELOADED))
+
+
+def _wait_for_loader():
+    """Waits for the data to be loaded in the background, must be called before taking ``_lock``, which the loader
+    needs to finish"""
+    if _loader is not None and _loader is not threading.current_thread():
+        _loader.join()
+
+
+def reload():
+    """Reloads data changed by another program
+
+    The tree of tasks is not replaced, instead it is compared with the newly loaded tree by task ids, and only inserted,
+    removed and changed tasks are updated
+    """
+    global _root_task
+    _wait_for_loader()
+    with _lock:
+        old_root = _root_task
+        _load()
+        if old_root is None:
+            changes = [TaskChange(ChangeKind.RELOADED)]
+        else:
+            new_root = _root_task
+            _root_task = old_root
+            changes = _merge_tasks(new_root)
+            _root_task.journal_seq = new_root.journal_seq
+            _root_task.allocate_id(new_root._last_id)
+            _relink_timetable()
+    _notify(*changes)
+
+
+def _relink_timetable():
+    """Points deadline entries of the newly loaded timetable to the tasks of the tree in memory, instead of the tasks
+    of the discarded tree they were loaded with"""
+    tasks_by_id = {task.id: task for task in _root_task.iter_subtree(skip_excluded=False)}
+    for date, items in list(_timetable.iter_days()):
+        for item in list(items):
+            if isinstance(item, TimetableTask):
+                task = tasks_by_id.get(item.task.id)
+                if task is not None:
+                    item.task = task
+                else:
+                    _timetable.remove_item(item)
+
+
+def _merge_tasks(new_root: TaskNode) -> list[TaskChange]:
+    """Makes the tree of tasks in memory identical to *new_root*'s tree, matching tasks by their ids
+    :returns: changes made to the tree in memory
+    """
+    nodes = {node.id: node for node in _root_task.iter_subtree(skip_excluded=False)}
+    new_ids = set()
+    changes = []
+    parents_to_sort = {}
+    for new_node in new_root.iter_subtree(skip_excluded=False):
+        new_ids.add(new_node.id)
+        if new_node is new_root:
+            continue
+        parent = nodes[new_node.parent_node.id]
+        node = nodes.get(new_node.id)
+        if node is None:
+            node = TaskNode(new_node.text, new_node.deadline, new_node._importance, new_node.id)
+            node._is_done = new_node.is_done
+            parent.insert_subtask(node)
+            nodes[node.id] = node
+            changes.append(TaskChange(ChangeKind.INSERTED, node, parent))
+            continue
+        moved = node.parent_node is not parent
+        if not moved and (node.text, node.deadline, node._importance, node.is_done) == \
+                (new_node.text, new_node.deadline, new_node._importance, new_node.is_done):
+            continue
+        if moved:
+            changes.append(TaskChange(ChangeKind.REMOVED, node, node.parent_node))
+            node.remove()
+        node.text = new_node.text
+        node.deadline = new_node.deadline
+        node._importance = new_node._importance
+        node._is_done = new_node.is_done
+        if moved:
+            parent.insert_subtask(node)
+            changes.append(TaskChange(ChangeKind.INSERTED, node, parent))
+        else:
+            node.update_cached_values()
+            parents_to_sort[parent.id] = parent
+            changes.append(TaskChange(ChangeKind.CHANGED, node, parent))
+
+    for node in list(nodes.values()):
+        if node.id not in new_ids and node.parent_node.id in new_ids:
+            changes.append(TaskChange(ChangeKind.REMOVED, node, node.parent_node))
+            node.remove()
+    for parent in parents_to_sort.values():
+        parent.sort_children()
+    return changes
+
+
+def _load():
+    with _lock:
+        if _journal is not None:
+            flush()
+        if session_config.IOConfig.storage_backend == "sqlite":
+            _load_database()
+        else:
+            _load_files()
+
+
+def _load_files():
+    global _journal
+    global _replaying
+    # Both files are read at the same time, events are parsed after the tasks, because they refer to them
+    with concurrent.futures.ThreadPoolExecutor(max_workers=2) as executor:
+        tasks_data = executor.submit(_read_file, session_config.IOConfig.tasks_file)
+        events_data = executor.submit(_read_file, session_config.IOConfig.event_file)
+        load_tasks(tasks_data.result())
+        load_events(events_data.result())
+    _dirty.clear()
+    seqs = [_root_task.journal_seq] + ([_timetable.journal_seq] if _timetable is not None else [])
+    # Snapshots may have different seqs (an unchanged store is not rewritten, and a crash can happen between replacing
+    # the files), records are replayed from the older one, operations already in the newer snapshot are skipped
+    # by _replay or have no effect when repeated
+    _journal = Journal(session_config.IOConfig.journal_file, fsync=session_config.IOConfig.fsync_policy == "always")
+    _journal.seq = max(seqs)
+    _replaying = True
+    try:
+        for seq, operation, args in _journal.records(after=min(seqs)):
+            _replay(operation, args)
+    finally:
+        _replaying = False
+
+
+def _load_database():
+    """Loads tasks and events from the database, which is filled with the data from the files when it is first used"""
+    global _journal
     global _root_task
     global _timetable
-    if len(args) == 2 and isinstance(args[0], datetime.date) and isinstance(args[1], int):
-        _timetable.remove_item(args[0], args[1])
-    if len(args) == 1 and isinstance(args[0], TimetableItem):
-        _timetable.remove_item(args[0])
-    dump_timetable()
+    store = _journal
+    if not isinstance(store, SqliteStore) or store.path != session_config.IOConfig.database_file:
+        store = SqliteStore(session_config.IOConfig.database_file)
+    if not store.is_imported:
+        _load_files()
+        store.import_data(_root_task, _timetable or Timetable())
+    _journal = store
+    _root_task = store.load_tasks()
+    _timetable = store.load_timetable(list(_root_task.iter_subtree(skip_excluded=False)))
+    _dirty.clear()
+    _remember_write(store.path)
 
 
-def load_events():
+def _read_file(path: Path) -> bytes | None:
+    """Returns contents of the file at *path*, ``None`` if there is no such file"""
+    try:
+        with open(path, "rb") as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def load_events(data: bytes = None):
+    """Loads the timetable from *data*, or from the events file if *data* is not given"""
     global _root_task
     global _timetable
-    if session_config.IOConfig.event_file.is_file():
-        with open(session_config.IOConfig.event_file, "rb") as file:
-            try:
-                _timetable = pickle.load(file)
-            except EOFError:
-                _timetable = Timetable()
+    if data is None:
+        data = _read_file(session_config.IOConfig.event_file)
+    if data is not None:
+        tasks_by_id = {task.id: task for task in _root_task.iter_subtree(skip_excluded=False)}
+        _timetable = storage.load_timetable(data, tasks_by_id)
+        if storage.is_legacy(data):
+            _link_legacy_tasks()
+            dump_timetable()
+
+
+def _link_legacy_tasks():
+    """Replaces copies of tasks, pickled along with the timetable by older versions of the app,
+    with the tasks from the tree of tasks"""
+    for items in list(_timetable.daytables_by_date.values()):
+        for item in list(items):
+            if isinstance(item, TimetableTask):
+                task = _root_task.find_subtask(item.task)
+                if task:
+                    item.task = task
+                else:
+                    _timetable.remove_item(item)
+    _timetable.reindex()
 
 
 def dump_timetable():
     global _root_task
     global _timetable
-    with open(session_config.IOConfig.event_file, "wb") as file:
-        pickle.dump(_timetable, file)
+    _replace_files({session_config.IOConfig.event_file: storage.dump_timetable(_timetable)})
 
 
-def load_tasks():
+def load_tasks(data: bytes = None):
+    """Loads the tree of tasks from *data*, or from the tasks file if *data* is not given"""
     global _root_task
     global _timetable
-    with open(session_config.IOConfig.tasks_file, "rb") as file:
-        try:
-            _root_task = pickle.load(file)
-        except EOFError:
-            _root_task = TaskNode()
+    if data is None:
+        with open(session_config.IOConfig.tasks_file, "rb") as file:
+            data = file.read()
+    _root_task = storage.load_tasks(data)
     _root_task.sort_children()
+    if _assign_missing_ids() or storage.is_legacy(data):
+        dump_tasks()
+
+
+def _assign_missing_ids() -> bool:
+    """Gives ids to the tasks loaded from a file written before tasks had ids
+    :returns: ``True`` if any task was given a new id
+    """
+    if _root_task.id is None:
+        _root_task.id = 0
+    missing = []
+    for node in _root_task.iter_subtree(skip_excluded=False):
+        if node.id is None:
+            missing.append(node)
+        else:
+            node.allocate_id(node.id)
+    for node in missing:
+        node.id = node.allocate_id()
+    if len(missing) > 0:
+        _root_task.drop_index()
+    return len(missing) > 0
 
 
 def dump_tasks():
     global _root_task
     global _timetable
-    with open(session_config.IOConfig.tasks_file, "wb") as file:
-        pickle.dump(_root_task, file)
-
+    _replace_files({session_config.IOConfig.tasks_file: storage.dump_tasks(_root_task)})
@@ -0,0 +1,79 @@
+import os
+import pickle
+from pathlib import Path
+
+
+class Journal:
+    """An append-only log of backend operations
+
+    Every record is a pickled ``(seq, operation, args)`` tuple, where *seq* grows monotonically. Records are replayed
+    on top of the last snapshot of the data when it is loaded, the journal is truncated once a newer snapshot is written
+    """
+
+    def __init__(self, path: Path, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self.seq = 0
+
+    @property
+    def size(self) -> int:
+        """Size of the journal file in bytes"""
+        try:
+            return self.path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def make_record(self, operation: str, *args) -> bytes:
+        """Creates a new record without writing it, arguments are serialized right away
+        :arg operation: name of the operation
+        :arg args: arguments of the operation, should only contain plain data (ids, strings, dates, etc.)
+        :returns: serialized record
+        """
+        self.seq += 1
+        return pickle.dumps((self.seq, operation, args))
+
+    def write(self, records: list[bytes]):
+        """Appends records created by ``make_record`` to the journal in a single write"""
+        with open(self.path, "ab") as file:
+            file.write(b"".join(records))
+            if self.fsync:
+                file.flush()
+                os.fsync(file.fileno())
+
+    def append(self, operation: str, *args) -> int:
+        """Creates a new record and appends it to the journal
+        :returns: sequence number of the new record
+        """
+        self.write([self.make_record(operation, *args)])
+        return self.seq
+
+    def records(self, after: int = 0):
+        """Yields ``(seq, operation, args)`` for every complete record in the journal, which has seq greater than *after*
+
+        A partially written or corrupted trailing record (e.g. left by a crash) is cut off the journal once all the
+        records before it have been read, so new records are not appended after it
+        """
+        if not self.path.is_file():
+            return
+        with open(self.path, "rb") as file:
+            good_size = 0
+            while True:
+                try:
+                    seq, operation, args = pickle.load(file)
+                except EOFError:
+                    if file.tell() == good_size:
+                        return
+                    break
+                except Exception:
+                    # A torn record can fail to unpickle in many ways, including a huge bogus length (MemoryError)
+                    break
+                good_size = file.tell()
+                self.seq = max(self.seq, seq)
+                if seq > after:
+                    yield seq, operation, args
+        os.truncate(self.path, good_size)
+
+    def truncate(self):
+        """Removes all records from the journal"""
+        with open(self.path, "wb"):
+            pass
@@ -0,0 +1,94 @@
+import os
+import stat
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+
+class PersistenceThread:
+    """A background thread, which calls *flush* after changes were requested
+
+    All requests made within *delay* seconds of the first one are coalesced into a single call
+    """
+    _thread: threading.Thread
+    _terminate: bool = False
+
+    def __init__(self, flush, delay: float):
+        self.flush = flush
+        self.delay = delay
+        self._requested = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @property
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def start(self):
+        self._thread.start()
+
+    def request(self):
+        """Schedules a call to flush"""
+        self._requested.set()
+
+    def _run(self):
+        while not self._terminate:
+            self._requested.wait()
+            if self._terminate:
+                break
+            time.sleep(self.delay)
+            self._requested.clear()
+            self.flush()
+
+    def terminate(self):
+        self._terminate = True
+        self._requested.set()
+        self._thread.join()
+
+
+def replace_files(contents: dict[Path, bytes], fsync: bool = True):
+    """Atomically replaces contents of the files
+
+    Every file is first written to a temporary file next to it, then all of them are synced to disk together and renamed
+    over the originals, so readers (or a crash) only ever see complete files
+    :arg contents: new contents of each file
+    :arg fsync: should the data be synced to disk before the files are replaced
+    """
+    temporary_files = {}
+    try:
+        for path, data in contents.items():
+            descriptor, temporary_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+            temporary_files[path] = temporary_path
+            try:
+                os.chmod(temporary_path, stat.S_IMODE(os.stat(path).st_mode))
+            except FileNotFoundError:
+                os.chmod(temporary_path, 0o644)
+            with os.fdopen(descriptor, "wb") as file:
+                file.write(data)
+                if fsync:
+                    file.flush()
+                    os.fsync(file.fileno())
+        for path, temporary_path in temporary_files.items():
+            os.replace(temporary_path, path)
+    except BaseException:
+        for temporary_path in temporary_files.values():
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        raise
+    if fsync:
+        for directory in {path.parent for path in contents}:
+            _fsync_directory(directory)
+
+
+def _fsync_directory(directory: Path):
+    """Syncs a directory entry to disk, so renames inside of it are durable"""
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
@@ -0,0 +1,189 @@
+"""A small query language for finding tasks, used by saved views
+
+A query is a list of space separated terms, all of which have to match::
+
+    importance:doing_a,todo_a   one of the importances, "doing" stands for all DOING importances, "done" for done tasks
+    done:yes                    done (or not done, with "no") tasks
+    due:week                    tasks due within a date range, see below
+    text:report                 tasks containing the text (case-insensitive), same as a term without a key
+    under:"Project X"           subtasks (at any depth) of the task with this text
+
+Date ranges are ``FROM..TO`` (both inclusive, either may be omitted) or a single day, dates are ``YYYY-MM-DD``,
+``dd/mm/yyyy``, ``today``, ``tomorrow``, ``yesterday``, ``+N`` or ``-N`` days from today. ``week`` means the next 7
+days, ``overdue`` means not done tasks due before today, ``none`` means tasks without a deadline and ``any`` means
+tasks with one. Relative dates are resolved every time the query is run
+
+Queries are compiled once, running one starts from the smallest matching source: the deadline index, the importance
+buckets or, if neither applies, the subtree of tasks
+"""
+import datetime
+import shlex
+from dataclasses import dataclass
+
+from . import clock
+from .data import Importance
+
+# Date bound: a date, a number of days from today, or None for no bound
+DateBound = datetime.date | int | None
+
+_RELATIVE_DAYS = {"today": 0, "tomorrow": 1, "yesterday": -1}
+_YES = ("yes", "true", "1")
+_NO = ("no", "false", "0")
+
+
+@dataclass(frozen=True)
+class Query:
+    """Compiled query, see the module's documentation for the syntax"""
+    importances: frozenset[int] | None = None
+    done: bool | None = None
+    has_deadline: bool | None = None
+    due_from: DateBound = None
+    due_to: DateBound = None
+    texts: tuple[str, ...] = ()
+    under: str | None = None
+
+    @staticmethod
+    def _resolve(bound: DateBound, today: datetime.date) -> datetime.date | None:
+        if isinstance(bound, int):
+            return today + datetime.timedelta(days=bound)
+        return bound
+
+    def _predicates(self, today: datetime.date, skip: str = None) -> list:
+        """Returns checks of every condition of the query, except for the one named *skip*, which is already
+        satisfied by the source of the tasks"""
+        predicates = []
+        if self.importances is not None and skip != "importance":
+            predicates.append(lambda task: task.importance in self.importances)
+        if self.done is not None:
+            predicates.append(lambda task: task.is_done == self.done)
+        if skip != "deadline":
+            if self.has_deadline is not None:
+                predicates.append(lambda task: (task.deadline is not None) == self.has_deadline)
+            start, end = self._resolve(self.due_from, today), self._resolve(self.due_to, today)
+            if start is not None:
+                predicates.append(lambda task: task.deadline is not None and task.deadline >= start)
+            if end is not None:
+                predicates.append(lambda task: task.deadline is not None and task.deadline <= end)
+        for text in self.texts:
+            predicates.append(lambda task, text=text: task.text is not None and text in task.text.lower())
+        return predicates
+
+    def matches(self, task, today: datetime.date = None) -> bool:
+        """``True`` if *task* satisfies the query (except for the ``under`` condition, which depends on the tree)"""
+        if today is None:
+            today = clock.today()
+        return all(predicate(task) for predicate in self._predicates(today))
+
+    def run(self, root, skip_excluded: bool = False) -> list:
+        """Returns tasks of *root*'s subtree matching the query
+
+        Tasks found through an index are ordered by their deadlines or priorities, the others are in the order they
+        are displayed in
+        :arg skip_excluded: should tasks hidden by the current exclusion rules be left out
+        """
+        today = clock.today()
+        if self.under is not None:
+            root = root.find_subtask(self.under)
+            if not root:
+                return []
+        if self.has_deadline or self.due_from is not None or self.due_to is not None:
+            tasks = root.due_between(self._resolve(self.due_from, today), self._resolve(self.due_to, today))
+            skip = "deadline"
+        elif self.importances is not None:
+            tasks = sorted(root.with_importance(*self.importances), key=lambda task: task.get_sort_key(today))
+            skip = "importance"
+        else:
+            tasks = root.iter_subtree(include_self=False, skip_excluded=False)
+            skip = None
+        predicates = self._predicates(today, skip)
+        if skip_excluded:
+            predicates.append(lambda task: not task.is_excluded)
+        return [task for task in tasks if task is not root and all(predicate(task) for predicate in predicates)]
+
+
+def parse_query(text: str) -> Query:
+    """Compiles a query, see the module's documentation for the syntax
+    :raises ValueError: if the query is not valid
+    """
+    conditions = {}
+    texts = []
+    keys = set()
+    for term in shlex.split(text):
+        key, separator, value = term.partition(":")
+        if not separator:
+            key, value = "text", term
+        key = key.lower()
+        if key in keys and key != "text":
+            raise ValueError(f"{key} is used more than once")
+        keys.add(key)
+        match key:
+            case "importance" | "is":
+                conditions["importances"] = frozenset(_parse_importances(value))
+            case "done":
+                if "done" in conditions:
+                    raise ValueError("done conflicts with due:overdue, which only matches not done tasks")
+                conditions["done"] = _parse_bool(value)
+            case "due":
+                due = _parse_due(value)
+                if "done" in due and "done" in conditions:
+                    raise ValueError("done conflicts with due:overdue, which only matches not done tasks")
+                conditions.update(due)
+            case "text":
+                texts.append(value.lower())
+            case "under":
+                conditions["under"] = value
+            case _:
+                raise ValueError(f"unknown condition {key}")
+    return Query(texts=tuple(texts), **conditions)
+
+
+def _parse_importances(value: str) -> set[int]:
+    importances = set()
+    for name in value.upper().split(","):
+        if name in ("DOING", "TODO", "WAITING"):
+            importances.update(Importance[f"{name}_{level}"] for level in "ABC")
+        elif name in Importance.__members__:
+            importances.add(Importance[name])
+        else:
+            raise ValueError(f"unknown importance {name}")
+    return importances
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() in _YES:
+        return True
+    if value.lower() in _NO:
+        return False
+    raise ValueError(f"{value} is neither yes nor no")
+
+
+def _parse_due(value: str) -> dict:
+    value = value.lower()
+    if value == "none":
+        return {"has_deadline": False}
+    if value == "any":
+        return {"has_deadline": True}
+    if value == "overdue":
+        return {"due_to": -1, "done": False}
+    if value == "week":
+        return {"due_from": 0, "due_to": 6}
+    if ".." in value:
+        start, end = value.split("..", 1)
+        return {"due_from": _parse_date(start), "due_to": _parse_date(end)}
+    day = _parse_date(value)
+    return {"due_from": day, "due_to": day}
+
+
+def _parse_date(value: str) -> DateBound:
+    if value == "":
+        return None
+    if value in _RELATIVE_DAYS:
+        return _RELATIVE_DAYS[value]
+    if value[0] in "+-" and value[1:].isdigit():
+        return int(value)
+    try:
+        if "/" in value:
+            return datetime.datetime.strptime(value, "%d/%m/%Y").date()
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"{value} is not a valid date") from None
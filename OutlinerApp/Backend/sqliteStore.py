@@ -0,0 +1,206 @@
+import datetime
+import sqlite3
+from pathlib import Path
+
+from .tasks import TaskNode
+from .timetables import Timetable, TimetableItem, TimetableTask
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id         INTEGER PRIMARY KEY,
+    parent     INTEGER NOT NULL,
+    text       TEXT,
+    deadline   TEXT,
+    importance INTEGER NOT NULL,
+    done       INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS tasks_parent ON tasks (parent);
+CREATE INDEX IF NOT EXISTS tasks_deadline ON tasks (deadline);
+CREATE INDEX IF NOT EXISTS tasks_importance ON tasks (importance);
+
+CREATE TABLE IF NOT EXISTS events (
+    tid         INTEGER PRIMARY KEY,
+    date        TEXT NOT NULL,
+    name        TEXT,
+    location    TEXT,
+    description TEXT,
+    item_type   TEXT,
+    start_time  TEXT,
+    end_time    TEXT
+);
+CREATE INDEX IF NOT EXISTS events_date ON events (date, start_time);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value INTEGER
+);
+"""
+
+_SUBTREE = "WITH RECURSIVE subtree(id) AS (SELECT ? UNION ALL " \
+           "SELECT tasks.id FROM tasks JOIN subtree ON tasks.parent = subtree.id) "
+
+
+def _date(value: str | None) -> datetime.date | None:
+    return None if value is None else datetime.date.fromisoformat(value)
+
+
+def _time(value: str | None) -> datetime.time | None:
+    return None if value is None else datetime.time.fromisoformat(value)
+
+
+def _iso(value) -> str | None:
+    return None if value is None else value.isoformat()
+
+
+class SqliteStore:
+    """Stores tasks and events as rows of an SQLite database, so every operation only updates the affected rows
+
+    Has the same interface for writing records as ``Journal``. The root task is not stored, its children have parent 0.
+    ``TimetableTask`` items are not stored either, they are recreated from deadlines of the tasks
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.seq = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.executescript(_SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    @property
+    def is_imported(self) -> bool:
+        """``True`` once ``import_data`` has filled the database, even if all tasks were removed since then"""
+        return self.connection.execute("SELECT 1 FROM meta WHERE key = 'imported'").fetchone() is not None
+
+    def make_record(self, operation: str, *args) -> tuple:
+        self.seq += 1
+        return operation, args
+
+    def write(self, records: list[tuple]):
+        """Applies operations to the database in a single transaction"""
+        with self.connection:
+            for operation, args in records:
+                self._apply(operation, args)
+
+    def _apply(self, operation: str, args: tuple):
+        execute = self.connection.execute
+        match operation:
+            case "add_subtask":
+                parent_id, task_id, text, deadline, importance = args
+                execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, 0)",
+                        (task_id, parent_id, text, _iso(deadline), int(importance)))
+                execute("INSERT INTO meta VALUES ('last_id', ?) ON CONFLICT (key) DO UPDATE "
+                        "SET value = max(value, excluded.value)", (task_id,))
+            case "mark_done":
+                task_id, = args
+                row = execute("SELECT done FROM tasks WHERE id = ?", (task_id,)).fetchone()
+                if row is not None:
+                    execute(_SUBTREE + "UPDATE tasks SET done = ? WHERE id IN subtree", (task_id, not row[0]))
+            case "set_done":
+                task_ids, is_done = args
+                for task_id in task_ids:
+                    execute(_SUBTREE + "UPDATE tasks SET done = ? WHERE id IN subtree", (task_id, is_done))
+            case "edit_task":
+                task_id, new_text, new_deadline = args
+                if isinstance(new_text, str):
+                    execute("UPDATE tasks SET text = ? WHERE id = ?", (new_text, task_id))
+                if isinstance(new_deadline, datetime.date) or new_deadline == "":
+                    execute("UPDATE tasks SET deadline = ? WHERE id = ?", (_iso(new_deadline or None), task_id))
+            case "remove_task":
+                task_id, = args
+                execute(_SUBTREE + "DELETE FROM tasks WHERE id IN subtree", (task_id,))
+            case "add_to_timetable":
+                if isinstance(args[0], TimetableItem):
+                    self._insert_event(args[0])
+                    return
+                tid, date, name, start_time, end_time, location, description, task_id = args
+                # Deadline entries of tasks only reserve their TIDs
+                item_type = TimetableTask if task_id is not None else TimetableItem
+                self._insert_event(item_type(date, name, tid, location, description, start_time, end_time))
+            case "edit_event":
+                tid, new_date, name, start_time, end_time = args
+                execute("UPDATE events SET date = ?, name = ?, start_time = ?, end_time = ? WHERE tid = ?",
+                        (_iso(new_date), name, _iso(start_time), _iso(end_time), tid))
+            case "remove_from_timetable":
+                execute("DELETE FROM events WHERE tid = ?", (args[0],))
+            case "transaction":
+                for sub_operation, sub_args in args[0]:
+                    self._apply(sub_operation, sub_args)
+
+    def _insert_event(self, item: TimetableItem):
+        self.connection.execute("INSERT INTO meta VALUES ('last_tid', ?) ON CONFLICT (key) DO UPDATE "
+                                "SET value = max(value, excluded.value)", (item.TID,))
+        if isinstance(item, TimetableTask):
+            return
+        self.connection.execute("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                                (item.TID, _iso(item.date), item.name, item.location, item.description,
+                                 item.item_type, _iso(item.start_time), _iso(item.end_time)))
+
+    def import_data(self, root: TaskNode, timetable: Timetable):
+        """Fills the database with tasks and events loaded from files"""
+        with self.connection:
+            nodes = [root]
+            while len(nodes) > 0:
+                node = nodes.pop()
+                nodes.extend(node.child_nodes)
+                if node is root:
+                    continue
+                self.connection.execute("INSERT OR REPLACE INTO tasks VALUES (?, ?, ?, ?, ?, ?)",
+                                        (node.id, node.parent_node.id, node.text, _iso(node.deadline),
+                                         int(node._importance), node.is_done))
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('last_id', ?)", (root._last_id,))
+            self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('imported', 1)")
+            for items in timetable.daytables_by_date.values():
+                for item in items:
+                    self._insert_event(item)
+
+    def load_tasks(self) -> TaskNode:
+        root = TaskNode()
+        root.id = 0
+        children: dict[int, list[TaskNode]] = {}
+        for task_id, parent_id, text, deadline, importance, done in self.connection.execute("SELECT * FROM tasks"):
+            node = TaskNode(text, _date(deadline), importance, task_id)
+            node._is_done = bool(done)
+            children.setdefault(parent_id, []).append(node)
+
+        parents = [root]
+        while len(parents) > 0:
+            parent = parents.pop()
+            for child in children.get(parent.id, []):
+                parent.append_subtask(child)
+                parents.append(child)
+            parent.sort_children()
+
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'last_id'").fetchone()
+        root._last_id = row[0] if row is not None else 0
+        return root
+
+    def load_timetable(self, tasks: list[TaskNode]) -> Timetable:
+        """Loads events and creates ``TimetableTask`` items for *tasks* which have a deadline"""
+        timetable = Timetable()
+        for tid, date, name, location, description, item_type, start_time, end_time in \
+                self.connection.execute("SELECT * FROM events ORDER BY date, start_time"):
+            item = TimetableItem(date=_date(date), name=name, location=location, description=description,
+                                 item_type=item_type, start_time=_time(start_time))
+            item.TID = tid
+            item.end_time = _time(end_time)
+            timetable.add_item(item)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = 'last_tid'").fetchone()
+        if row is not None:
+            timetable._last_tid = max(timetable._last_tid, row[0])
+        for task in tasks:
+            if task.deadline is not None and not task.is_root:
+                timetable.add_item(TimetableItem.from_task_with_deadline(task))
+        return timetable
+
+    def task_ids_due(self, start: datetime.date, end: datetime.date = None) -> list[int]:
+        """Returns ids of tasks with a deadline between *start* and *end* (inclusive), ordered by deadline"""
+        if end is None:
+            end = start
+        return [row[0] for row in self.connection.execute(
+            "SELECT id FROM tasks WHERE deadline BETWEEN ? AND ? ORDER BY deadline", (_iso(start), _iso(end)))]
+
+    def task_ids_by_importance(self, importance: int) -> list[int]:
+        return [row[0] for row in self.connection.execute(
+            "SELECT id FROM tasks WHERE importance = ? AND NOT done", (int(importance),))]
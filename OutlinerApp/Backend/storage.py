@@ -0,0 +1,220 @@
+"""Compact binary format of the tasks and events files
+
+All integers are little-endian. Both files start with a header, followed by a table of all strings used in the file
+and a block of fixed-width records, which refer to strings by their index in the table (-1 stands for ``None``)
+
+Tasks file::
+
+    header        magic b"OTLT", version u16, flags u16, journal_seq u64, last_id u64, string_count u32, node_count u32
+    strings       string_count x (length u32, utf-8 bytes)
+    nodes         node_count x (id i64, parent i32, text i32, deadline i32, importance i16, flags u8)
+
+Nodes are stored in pre-order, so a node's *parent* (index of the parent node's record, -1 for the root) always
+precedes it, and siblings are stored in the order they are displayed. *deadline* is a proleptic Gregorian ordinal,
+0 if the task has no deadline. Bit 0 of node *flags* is set if the task is done
+
+Events file::
+
+    header        magic b"OTLE", version u16, flags u16, journal_seq u64, last_tid u64, string_count u32,
+                  item_count u32
+    strings       string_count x (length u32, utf-8 bytes)
+    items         item_count x (date i32, TID i64, name i32, location i32, description i32, item_type i32,
+                                start_time i32, end_time i32, task i64)
+
+*last_tid* is the last TID allocated by the timetable, it is missing from version 1 files.
+*start_time* and *end_time* are seconds since midnight, -1 if not set. *task* is the id of the task a
+``TimetableTask`` refers to, -1 for other items
+
+Files which do not start with the magic bytes are treated as pickled objects written by older versions of the app
+"""
+import datetime
+import pickle
+import struct
+
+from .tasks import TaskNode
+from .timetables import Timetable, TimetableItem, TimetableTask
+
+VERSION = 2
+
+TASKS_MAGIC = b"OTLT"
+EVENTS_MAGIC = b"OTLE"
+
+_TASKS_HEADER = struct.Struct("<4sHHQQII")
+_EVENTS_HEADER = struct.Struct("<4sHHQQII")
+_EVENTS_HEADER_V1 = struct.Struct("<4sHHQII")
+_STRING_LENGTH = struct.Struct("<I")
+_NODE = struct.Struct("<qiiihB")
+_ITEM = struct.Struct("<iqiiiiiiq")
+
+_DONE_FLAG = 1
+
+
+def is_legacy(data: bytes) -> bool:
+    """``True`` if *data* is not empty and was not written in this format"""
+    return len(data) > 0 and data[:4] not in (TASKS_MAGIC, EVENTS_MAGIC)
+
+
+class _StringTable:
+    def __init__(self):
+        self.strings: list[str] = []
+        self.indices: dict[str, int] = {}
+
+    def index(self, string: str | None) -> int:
+        if string is None:
+            return -1
+        index = self.indices.get(string)
+        if index is None:
+            index = self.indices[string] = len(self.strings)
+            self.strings.append(string)
+        return index
+
+    def dump(self) -> bytes:
+        chunks = []
+        for string in self.strings:
+            encoded = string.encode("utf-8")
+            chunks.append(_STRING_LENGTH.pack(len(encoded)))
+            chunks.append(encoded)
+        return b"".join(chunks)
+
+
+def _load_strings(data: bytes, offset: int, count: int) -> tuple[list[str], int]:
+    strings = []
+    for _ in range(count):
+        length, = _STRING_LENGTH.unpack_from(data, offset)
+        offset += _STRING_LENGTH.size
+        strings.append(data[offset:offset + length].decode("utf-8"))
+        offset += length
+    return strings, offset
+
+
+def _check_header(magic: bytes, version: int, expected_magic: bytes):
+    if magic != expected_magic:
+        raise ValueError(f"unknown file type {magic!r}")
+    if version > VERSION:
+        raise ValueError(f"file version {version} is newer than supported version {VERSION}")
+
+
+def _time_to_seconds(time: datetime.time | None) -> int:
+    if time is None:
+        return -1
+    return time.hour * 3600 + time.minute * 60 + time.second
+
+
+def _seconds_to_time(seconds: int) -> datetime.time | None:
+    if seconds < 0:
+        return None
+    return datetime.time(seconds // 3600, seconds // 60 % 60, seconds % 60)
+
+
+def dump_tasks(root: TaskNode) -> bytes:
+    """Serializes the tree of tasks starting at *root*"""
+    strings = _StringTable()
+    records = []
+    indices = {}
+    stack = [root]
+    while len(stack) > 0:
+        node = stack.pop()
+        indices[id(node)] = len(records)
+        parent = -1 if node is root else indices[id(node.parent_node)]
+        deadline = 0 if node.deadline is None else node.deadline.toordinal()
+        records.append(_NODE.pack(node.id, parent, strings.index(node.text), deadline, node._importance,
+                                  _DONE_FLAG if node.is_done else 0))
+        stack.extend(reversed(node.child_nodes))
+    header = _TASKS_HEADER.pack(TASKS_MAGIC, VERSION, 0, root.journal_seq, root._last_id,
+                                len(strings.strings), len(records))
+    return header + strings.dump() + b"".join(records)
+
+
+def load_tasks(data: bytes) -> TaskNode:
+    """Restores a tree of tasks serialized by ``dump_tasks``, or pickled by older versions of the app
+    :returns: root of the tree
+    """
+    if len(data) == 0:
+        return TaskNode()
+    if is_legacy(data):
+        root = pickle.loads(data)
+        root.refresh_counts()
+        return root
+    magic, version, flags, journal_seq, last_id, string_count, node_count = _TASKS_HEADER.unpack_from(data)
+    _check_header(magic, version, TASKS_MAGIC)
+    strings, offset = _load_strings(data, _TASKS_HEADER.size, string_count)
+
+    nodes = []
+    end = offset + node_count * _NODE.size
+    for task_id, parent, text, deadline, importance, node_flags in _NODE.iter_unpack(data[offset:end]):
+        node = TaskNode(strings[text] if text >= 0 else None,
+                        datetime.date.fromordinal(deadline) if deadline else None,
+                        importance, task_id)
+        node._is_done = bool(node_flags & _DONE_FLAG)
+        if parent >= 0:
+            nodes[parent].append_subtask(node)
+        nodes.append(node)
+
+    root = nodes[0] if len(nodes) > 0 else TaskNode()
+    root.journal_seq = journal_seq
+    root._last_id = last_id
+    return root
+
+
+def dump_timetable(timetable: Timetable) -> bytes:
+    """Serializes *timetable*, tasks are stored as references to their ids"""
+    strings = _StringTable()
+    records = []
+    for date, items in timetable.daytables_by_date.items():
+        for item in items:
+            task_id = -1
+            if isinstance(item, TimetableTask):
+                if item.task is None or item.task.id is None:
+                    continue
+                task_id = item.task.id
+            records.append(_ITEM.pack(date.toordinal(), item.TID, strings.index(item.name),
+                                      strings.index(item.location), strings.index(item.description),
+                                      strings.index(item.item_type), _time_to_seconds(item.start_time),
+                                      _time_to_seconds(item.end_time), task_id))
+    header = _EVENTS_HEADER.pack(EVENTS_MAGIC, VERSION, 0, timetable.journal_seq, timetable._last_tid,
+                                 len(strings.strings), len(records))
+    return header + strings.dump() + b"".join(records)
+
+
+def load_timetable(data: bytes, tasks_by_id: dict[int, TaskNode]) -> Timetable:
+    """Restores a timetable serialized by ``dump_timetable``, or pickled by older versions of the app
+    :arg tasks_by_id: tasks, ``TimetableTask`` items can refer to; items referring to missing tasks are dropped
+    """
+    if len(data) == 0:
+        return Timetable()
+    if is_legacy(data):
+        timetable = pickle.loads(data)
+        timetable.reindex()
+        return timetable
+    magic, version = _EVENTS_HEADER_V1.unpack_from(data)[:2]
+    _check_header(magic, version, EVENTS_MAGIC)
+    if version == 1:
+        magic, version, flags, journal_seq, string_count, item_count = _EVENTS_HEADER_V1.unpack_from(data)
+        last_tid, header_size = 0, _EVENTS_HEADER_V1.size
+    else:
+        magic, version, flags, journal_seq, last_tid, string_count, item_count = _EVENTS_HEADER.unpack_from(data)
+        header_size = _EVENTS_HEADER.size
+    strings, offset = _load_strings(data, header_size, string_count)
+
+    timetable = Timetable()
+    timetable.journal_seq = journal_seq
+    end = offset + item_count * _ITEM.size
+    for date, tid, name, location, description, item_type, start_time, end_time, task_id in \
+            _ITEM.iter_unpack(data[offset:end]):
+        fields = dict(date=datetime.date.fromordinal(date),
+                      name=strings[name] if name >= 0 else None,
+                      location=strings[location] if location >= 0 else None,
+                      description=strings[description] if description >= 0 else None,
+                      item_type=strings[item_type] if item_type >= 0 else None,
+                      start_time=_seconds_to_time(start_time))
+        if task_id >= 0:
+            if task_id not in tasks_by_id:
+                continue
+            item = TimetableTask(task=tasks_by_id[task_id], **fields)
+        else:
+            item = TimetableItem(**fields)
+        item.TID = tid
+        item.end_time = _seconds_to_time(end_time)
+        timetable.add_item(item)
+    timetable._last_tid = max(timetable._last_tid, last_tid)
+    return timetable
@@ -1,13 +1,52 @@
-from datetime import date
+import bisect
+import itertools
+from datetime import date, timedelta
 from typing import overload, Union
 
+from . import clock
 from . import data
 from .configs import session_config
-from .data import Importance
+from .data import Importance, TaskCounts
+from .deadlineIndex import DeadlineIndex
+
+
+_NO_COUNTS = TaskCounts()
+# Counts of a single task are shared between tasks, instead of keeping a copy in each of them
+_OWN_COUNTS = {(done, excluded, overdue): TaskCounts(1, int(done), int(excluded), int(overdue))
+               for done in (False, True) for excluded in (False, True) for overdue in (False, True)}
+
+
+class _RootIndexes:
+    """Indexes and caches of a whole tree, only its root node references them, so other nodes do not need slots for
+    them"""
+    __slots__ = ("counts_key", "text", "ids", "deadlines", "importance")
+
+    def __init__(self):
+        self.counts_key: tuple | None = None
+        self.text: dict[str, Union["TaskNode", list["TaskNode"]]] | None = None
+        self.ids: dict[int, "TaskNode"] | None = None
+        self.deadlines: DeadlineIndex | None = None
+        self.importance: dict[int, dict[int, "TaskNode"]] | None = None
 
 
 class TaskNode:
     """A class representing a task node in a tree of tasks"""
+    # Trees can hold millions of tasks, slots save a per-instance dict
+    __slots__ = ("is_root", "root_node", "ident_level", "id", "_text", "parent_node", "child_nodes", "_deadline",
+                 "_importance", "_is_done", "_counts", "_own_counts", "_sort_key", "_sort_key_date",
+                 # Only used by root nodes
+                 "_last_id", "journal_seq", "_indexes")
+    # Indexes are rebuilt after loading, instead of being pickled
+    _UNPICKLED = ("_indexes",)
+
+    _last_id: int
+    journal_seq: int
+    _counts: TaskCounts
+    _own_counts: TaskCounts
+    # Created on the first use, ``None`` for nodes which are not roots
+    _indexes: _RootIndexes | None
+    _sort_key: tuple | None
+    _sort_key_date: date | None
 
     @property
     def icon(self):
@@ -31,40 +70,265 @@ class TaskNode:
 
     @property
     def total_children(self):
-        """A total number of tasks contained inside this task"""
-        if self.is_excluded:
-            return 0
+        """A total number of tasks contained inside this task, including the task itself (unless it is the root)"""
+        return self.counts.total
+
+    @property
+    def counts(self) -> TaskCounts:
+        """Numbers of all, done, excluded and overdue tasks in this task's subtree (including the task itself, unless it
+        is the root)
+
+        Counts are cached and updated along the chain of parents whenever the tree changes. They are recounted for the
+        whole tree only when the date or the exclusion rules have changed since the last count
+        """
+        indexes = self.root_node._indexes
+        if indexes is None or indexes.counts_key != self._make_counts_key():
+            self.root_node.refresh_counts()
+        return self._counts
+
+    @staticmethod
+    def _make_counts_key() -> tuple:
+        return clock.today(), tuple(session_config.TaskConfig.exclude_tasks)
+
+    def _count_self(self) -> TaskCounts:
+        if self.is_root:
+            return TaskCounts()
+        overdue = not self.is_done and self.deadline is not None and self.deadline < clock.today()
+        return _OWN_COUNTS[self.is_done, self.is_excluded, overdue]
+
+    def _propagate_counts(self, delta: TaskCounts):
+        """Adds *delta* to the counts of this task and all of its parents"""
+        node = self
+        while node is not None:
+            node._counts += delta
+            node = node.parent_node
+
+    def update_cached_values(self):
+        """Updates cached counts and the sort key after this task's status, importance or deadline was changed"""
+        self._sort_key = None
+        own_counts = self._count_self()
+        delta = own_counts - self._own_counts
+        self._own_counts = own_counts
+        self.root_node._index_importance(self)
+        if not any(delta):
+            return
         if len(self.child_nodes) == 0:
-            print(self)
-            return 1
+            # Leaves share their counts with other leaves
+            self._counts = own_counts
+            if self.parent_node is not None:
+                self.parent_node._propagate_counts(delta)
+        else:
+            self._propagate_counts(delta)
+
+    def refresh_counts(self):
+        """Recounts tasks in this task's whole subtree"""
+        nodes = [self]
+        order = []
+        while len(nodes) > 0:
+            node = nodes.pop()
+            order.append(node)
+            nodes.extend(node.child_nodes)
+        for node in reversed(order):
+            node._own_counts = node._count_self()
+            counts = node._own_counts
+            for child in node.child_nodes:
+                counts += child._counts
+            node._counts = counts
+        if self.is_root:
+            self._get_indexes().counts_key = self._make_counts_key()
+
+    @property
+    def text(self) -> str:
+        """Task's text"""
+        return self._text
+
+    @text.setter
+    def text(self, value: str):
+        self._sort_key = None
+        root = self.root_node
+        if root._indexes is not None and root._indexes.text is not None:
+            root._unindex_text(self)
+            self._text = value
+            root._index_text(self)
+        else:
+            self._text = value
+
+    @property
+    def deadline(self) -> date | None:
+        """Task's deadline"""
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, value: date | None):
+        self._sort_key = None
+        root = self.root_node
+        if root._indexes is not None and root._indexes.deadlines is not None:
+            root._indexes.deadlines.remove(self, self._deadline)
+            self._deadline = value
+            root._indexes.deadlines.add(self)
         else:
-            child_count = 0
-            for child in self.child_nodes:
-                child_count += child.total_children
-            return child_count + (0 if self.is_root else 1)
+            self._deadline = value
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """Returns the form of *text* used for finding tasks by their text"""
+        return text.strip("-")
+
+    def _get_indexes(self) -> _RootIndexes:
+        """Returns the indexes of this root node's tree, which may not be built yet"""
+        if self._indexes is None:
+            self._indexes = _RootIndexes()
+        return self._indexes
+
+    @property
+    def _is_indexed(self) -> bool:
+        return self._indexes is not None and self._indexes.ids is not None
+
+    def _get_built_indexes(self) -> _RootIndexes:
+        if not self._is_indexed:
+            self._build_index()
+        return self._indexes
+
+    def _get_text_index(self) -> dict[str, Union["TaskNode", list["TaskNode"]]]:
+        return self._get_built_indexes().text
+
+    def _get_id_index(self) -> dict[int, "TaskNode"]:
+        return self._get_built_indexes().ids
+
+    def _get_deadline_index(self) -> DeadlineIndex:
+        return self._get_built_indexes().deadlines
+
+    def _get_importance_index(self) -> dict[int, dict[int, "TaskNode"]]:
+        return self._get_built_indexes().importance
+
+    def _build_index(self):
+        """Indexes all tasks in this task's subtree by their text, id, deadline and importance, should only be called
+        on a root node"""
+        indexes = self._get_indexes()
+        indexes.text = {}
+        indexes.ids = {}
+        indexes.deadlines = DeadlineIndex()
+        indexes.importance = {}
+        nodes = [self]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            self._index_node(node)
+            nodes.extend(reversed(node.child_nodes))
+
+    def drop_index(self):
+        """Drops the index of this root node's tree, it is rebuilt on the next lookup,
+        should be called after ids were assigned to the tasks directly"""
+        if self._indexes is not None:
+            self._indexes.text = self._indexes.ids = self._indexes.deadlines = self._indexes.importance = None
+
+    def _index_node(self, node: "TaskNode"):
+        if node.id is not None:
+            self._indexes.ids[node.id] = node
+        self._index_text(node)
+        if not node.is_root:
+            self._indexes.deadlines.add(node)
+            self._index_importance(node)
+
+    def _unindex_node(self, node: "TaskNode"):
+        ids = self._indexes.ids
+        if ids.get(node.id) is node:
+            del ids[node.id]
+        self._unindex_text(node)
+        self._indexes.deadlines.remove(node, node.deadline)
+        self._unindex_importance(node)
+
+    def _index_importance(self, node: "TaskNode"):
+        """Moves *node* to the bucket of its current importance, buckets are keyed by ``id(node)`` to keep them
+        ordered and to not depend on task ids"""
+        if not self._is_indexed or node.is_root:
+            return
+        self._unindex_importance(node)
+        self._indexes.importance.setdefault(node.importance, {})[id(node)] = node
+
+    def _unindex_importance(self, node: "TaskNode"):
+        # There are only a few buckets, so the node is looked for in every one of them
+        for bucket in self._indexes.importance.values():
+            bucket.pop(id(node), None)
+
+    def _index_text(self, node: "TaskNode"):
+        # Most texts are unique, so a list is only created for texts shared by several tasks
+        if node.text is None or node.is_root:
+            return
+        key = self.normalize_text(node.text)
+        text_index = self._indexes.text
+        indexed = text_index.get(key)
+        if indexed is None:
+            text_index[key] = node
+        elif isinstance(indexed, list):
+            indexed.append(node)
+        else:
+            text_index[key] = [indexed, node]
+
+    def _unindex_text(self, node: "TaskNode"):
+        if node.text is None:
+            return
+        key = self.normalize_text(node.text)
+        text_index = self._indexes.text
+        indexed = text_index.get(key)
+        if indexed is node:
+            del text_index[key]
+        elif isinstance(indexed, list):
+            for index in range(len(indexed)):
+                if indexed[index] is node:
+                    del indexed[index]
+                    break
+            if len(indexed) == 1:
+                text_index[key] = indexed[0]
+
+    def _find_by_text(self, text: str) -> list["TaskNode"] | tuple["TaskNode", ...]:
+        """Returns all tasks of this root node's tree with the same normalized text as *text*"""
+        indexed = self._get_text_index().get(self.normalize_text(text))
+        if indexed is None:
+            return ()
+        if isinstance(indexed, list):
+            return indexed
+        return indexed,
 
     @property
     def is_excluded(self):
         """``True`` if this task should be excluded based on current exclusion rules"""
         return self.importance in session_config.TaskConfig.exclude_tasks and (
-                self.deadline is None or self.deadline < date.today())
+                self.deadline is None or self.deadline < clock.today())
 
     @property
     def priority(self):
         """How high should the task be in the TO-DO list"""
+        return self._priority_on(clock.today())
+
+    def _priority_on(self, today: date) -> int:
         priority = self.importance
         if self.is_done:
             priority = 1
         if self.deadline is not None:
-            if self.deadline > date.today():
+            if self.deadline > today:
                 if priority < 0:
                     priority = Importance.DEFAULT
             if priority > 0:
                 priority *= 1000
-                priority -= (self.deadline - date.today()).days
+                priority -= (self.deadline - today).days
 
         return priority
 
+    @property
+    def sort_key(self) -> tuple:
+        """Key ordering tasks in the TO-DO list, tasks with smaller keys go first
+
+        The key is cached until the task is changed or the day rolls over
+        """
+        return self.get_sort_key(clock.today())
+
+    def get_sort_key(self, today: date) -> tuple:
+        """Same as ``sort_key``, but takes the current date as an argument, so it can be obtained once for many tasks"""
+        if self._sort_key is None or self._sort_key_date != today:
+            self._sort_key = (-self._priority_on(today), self.text or "")
+            self._sort_key_date = today
+        return self._sort_key
+
     @property
     def importance(self):
         """Task's importance value"""
@@ -77,19 +341,41 @@ class TaskNode:
         """``True`` if the task was marked as done"""
         return self._is_done
 
-    def __init__(self, text: str = None, deadline: date = None, importance: int = data.Importance.TODO_B):
+    def __init__(self, text: str = None, deadline: date = None, importance: int = data.Importance.TODO_B,
+                 task_id: int = None):
 
         self.is_root = True
         self.root_node = self
         self.ident_level = 0
 
-        self.text: str = text
+        self.id: int | None = task_id
+        self._text: str = text
         self.parent_node: TaskNode | None = None
         self.child_nodes: list = []
-        self.deadline: date = deadline
+        self._deadline: date | None = deadline
         self._importance: int = importance
         self._is_done: bool = False
 
+        self._counts = self._own_counts = _NO_COUNTS
+        self._sort_key = None
+        self._sort_key_date = None
+        self._last_id = 0
+        self.journal_seq = 0
+        self._indexes = None
+
+    def __getstate__(self):
+        return {name: getattr(self, name) for name in self.__slots__ if name not in self._UNPICKLED}
+
+    def __setstate__(self, state: dict):
+        self.__init__()
+        # Tasks pickled by older versions of the app store text as a plain attribute and may lack newer attributes
+        for name in ("text", "deadline"):
+            if name in state:
+                state["_" + name] = state.pop(name)
+        for name, value in state.items():
+            if name in self.__slots__ and name not in self._UNPICKLED:
+                setattr(self, name, value)
+
     def __str__(self):
         if self.is_root:
             return ""
@@ -97,20 +383,29 @@ class TaskNode:
 
     def sort_children(self):
         """Orders task's childen based on their priority (Highest - first)"""
-        self.child_nodes.sort(reverse=True)
+        today = clock.today()
+        self.child_nodes.sort(key=lambda child: child.get_sort_key(today))
 
     def is_identical(self, other):
         """``True`` if task is equeal to other and task's and other's children are the same"""
         if isinstance(other, TaskNode):
             return (self == other) and self.child_nodes == other.child_nodes
 
+    def is_duplicate_of(self, other: "TaskNode") -> bool:
+        """``True`` if *other* has the same ``.text`` and ``.priority``, i.e. adding it next to this task would
+        duplicate it"""
+        return (self.text == other.text) and (self.priority == other.priority)
+
     def __eq__(self, other):
-        """``TaskNode`` is equal to another ``TaskNode``, if its ``.text`` and ``.priority`` is equeal to other
+        """``TaskNode`` is equal to another ``TaskNode``, if they have the same id, tasks without an id are only equal
+        to themselves
 
         ``TaskNode`` is equal to ``str`` if its ``.text`` is equal to ``str``
         """
         if isinstance(other, TaskNode):
-            return (self.text == other.text) and (self.priority == other.priority)
+            if self.id is None or other.id is None:
+                return self is other
+            return self.id == other.id
         elif isinstance(other, str):
             return self.text == other
         elif other is None:
@@ -118,6 +413,12 @@ class TaskNode:
         else:
             raise TypeError(f"cannot compare {type(other)} with TaskNode")
 
+    def __hash__(self):
+        """Hash of the task's id, a task should not be put into sets or dicts before it was given an id"""
+        if self.id is None:
+            return object.__hash__(self)
+        return hash(self.id)
+
     def compare_deadlines(self, other: "TaskNode"):
         if self.deadline is not None:
             if other.deadline is not None:
@@ -135,9 +436,8 @@ class TaskNode:
 
     def __gt__(self, other):
         if isinstance(other, TaskNode):
-            if self.priority == other.priority:
-                return self.text <= other.text
-            return self.priority > other.priority
+            today = clock.today()
+            return self.get_sort_key(today) <= other.get_sort_key(today)
 
         if isinstance(other, str):
             if self.text > other:
@@ -152,11 +452,63 @@ class TaskNode:
         :arg is_done: new value for task.is_done
         :arg affect_children: should task children's is_done fields be updated as well
         """
-        if affect_children:
-            for child in self.child_nodes:
-                child.set_done(is_done)
-        self._is_done = is_done
-        self.parent_node.sort_children()
+        TaskNode.set_done_many((self,), is_done, affect_children)
+
+    @staticmethod
+    def set_done_many(tasks, is_done: bool = True, affect_children: bool = True) -> list["TaskNode"]:
+        """Sets is_done of all *tasks* at once: flags are set in a single pass, counts of every ancestor are updated
+        once and every affected parent is re-sorted once
+        :arg tasks: tasks to update, they may come from different parts of the tree
+        :arg is_done: new value for tasks' is_done
+        :arg affect_children: should tasks children's is_done fields be updated as well
+        :returns: tasks whose is_done has changed
+        """
+        changed = []
+        seen = set()
+        for task in tasks:
+            for node in task.iter_subtree(skip_excluded=False) if affect_children else (task,):
+                if node.is_root or id(node) in seen:
+                    continue
+                seen.add(id(node))
+                if node._is_done != is_done:
+                    node._is_done = is_done
+                    changed.append(node)
+
+        # Deltas are summed up level by level, starting from the deepest one, so every ancestor is updated only once
+        deltas: dict[int, dict[int, list]] = {}
+
+        def add_delta(node: TaskNode, delta: TaskCounts):
+            level = deltas.setdefault(-1 if node.is_root else node.ident_level, {})
+            if id(node) in level:
+                level[id(node)][1] += delta
+            else:
+                level[id(node)] = [node, delta]
+
+        for node in changed:
+            node._sort_key = None
+            own_counts = node._count_self()
+            delta = own_counts - node._own_counts
+            node._own_counts = own_counts
+            node.root_node._index_importance(node)
+            if not any(delta):
+                continue
+            if len(node.child_nodes) == 0:
+                # Leaves share their counts with other leaves
+                node._counts = own_counts
+                if node.parent_node is not None:
+                    add_delta(node.parent_node, delta)
+            else:
+                add_delta(node, delta)
+        while len(deltas) > 0:
+            for node, delta in deltas.pop(max(deltas)).values():
+                node._counts += delta
+                if node.parent_node is not None:
+                    add_delta(node.parent_node, delta)
+
+        parents = {id(node.parent_node): node.parent_node for node in changed if node.parent_node is not None}
+        for parent in parents.values():
+            parent.sort_children()
+        return changed
 
     def toggle_done(self, affect_children: bool = True):
         """Toggles task's is_done status
@@ -165,51 +517,168 @@ class TaskNode:
         is_done = not self.is_done
         self.set_done(is_done, affect_children)
 
+    def iter_subtree(self, include_self: bool = True, skip_excluded: bool = True, prune_excluded: bool = False,
+                     with_deadline_only: bool = False, importances=None, max_depth: int = None):
+        """Lazily yields tasks of this task's subtree in pre-order, i.e. in the order they are displayed in
+        :arg include_self: should this task be yielded too
+        :arg skip_excluded: do not yield tasks excluded by current exclusion rules (their subtasks are still yielded)
+        :arg prune_excluded: do not yield excluded tasks, nor any of their subtasks
+        :arg with_deadline_only: only yield tasks with a deadline
+        :arg importances: only yield tasks with one of these importance values
+        :arg max_depth: do not go more than this many levels below this task
+        """
+        nodes = [(self, 0)]
+        while len(nodes) > 0:
+            node, depth = nodes.pop()
+            excluded = (skip_excluded or prune_excluded) and not node.is_root and node.is_excluded
+            if excluded and prune_excluded:
+                continue
+            if (include_self or node is not self) and not excluded \
+                    and (not with_deadline_only or node.deadline is not None) \
+                    and (importances is None or node.importance in importances):
+                yield node
+            if max_depth is None or depth < max_depth:
+                nodes.extend((child, depth + 1) for child in reversed(node.child_nodes))
+
+    def iter_tree_lines(self):
+        """Lazily yields lines of a string depiction of task's tree"""
+        tab_string = session_config.TaskConfig.tab_string
+        for node in self.iter_subtree(include_self=not self.is_root, prune_excluded=True):
+            yield f"{tab_string * node.ident_level} {node.icon} {node.text}\n"
+
     def get_tree(self):
         """Returnes a string depiction of task's tree"""
-        if self.is_root:
-            out = ""
-        elif self.is_excluded:
-            return ""
-        else:
-            out = f"{session_config.TaskConfig.tab_string * self.ident_level} {self.icon} {self.text}\n"
-        for child in self.child_nodes:
-            out += child.get_tree()
-        return out
+        return "".join(self.iter_tree_lines())
 
     def get_all_children(self, with_deadline_only=False):
         """Returns a list of all nodes that are successors of this task"""
-        include_self = True
-        if (with_deadline_only and self.deadline is None) or self.is_root or self.is_excluded:
-            include_self = False
-
-        nodes = [self] if include_self else []
-
-        if len(self.child_nodes) > 0:
-            for child in self.child_nodes:
-                nodes.extend(child.get_all_children())
-
-        return nodes
+        return list(self.iter_subtree(include_self=not self.is_root, with_deadline_only=with_deadline_only))
 
     def add_subtask(self, subtask):
         """Adds a new task to this task's children"""
         already_in = self.find_subtask(subtask)
         if not already_in:
-
-            subtask.is_root = False
-            subtask.parent_node = self
-            subtask.root_node = self.root_node
-            subtask.ident_level = subtask.get_level() - 1
-
-            for i in range(len(self.child_nodes)):
-                if subtask > self.child_nodes[i]:
-                    self.child_nodes.insert(i, subtask)
-                    break
-            else:
-                self.child_nodes.append(subtask)
+            self.insert_subtask(subtask)
             return True
         return False
 
+    def append_subtask(self, subtask: "TaskNode"):
+        """Appends *subtask* to the end of this task's children, without ordering them or checking for duplicates,
+        used to build a tree from already ordered data"""
+        self._attach_counts(subtask)
+        subtask.ident_level = 0 if self.is_root else self.ident_level + 1
+        self.child_nodes.append(subtask)
+        self._attach_subtree(subtask)
+
+    def insert_subtask(self, subtask: "TaskNode"):
+        """Inserts *subtask* (along with its subtree) into this task's children, keeping them ordered,
+        does not check for duplicates"""
+        subtask.id = self.root_node.allocate_id(subtask.id)
+        self._attach_counts(subtask)
+        self._insert_ordered(subtask)
+        self._attach_subtree(subtask)
+        nodes = [subtask]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            node.ident_level = node.get_level() - 1
+            nodes.extend(node.child_nodes)
+
+    def reposition_subtask(self, subtask: "TaskNode"):
+        """Moves *subtask* to its place among this task's children, after its sort key has changed"""
+        for index in range(len(self.child_nodes)):
+            if self.child_nodes[index] is subtask:
+                del self.child_nodes[index]
+                break
+        self._insert_ordered(subtask)
+
+    def _insert_ordered(self, subtask: "TaskNode"):
+        today = clock.today()
+        index = bisect.bisect_left(self.child_nodes, subtask.get_sort_key(today),
+                                   key=lambda child: child.get_sort_key(today))
+        self.child_nodes.insert(index, subtask)
+
+    def _attach_subtree(self, subtask: "TaskNode"):
+        """Moves tasks in *subtask*'s subtree to this task's tree and its index"""
+        root = self.root_node
+        # The subtask is no longer a root node
+        subtask._indexes = None
+        indexed = root._is_indexed
+        nodes = [subtask]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            node.root_node = root
+            if indexed:
+                root._index_node(node)
+            nodes.extend(node.child_nodes)
+
+    def _attach_counts(self, subtask: "TaskNode"):
+        """Makes *subtask* a child of this task and adds its counts to the counts of this task and its parents"""
+        subtask.parent_node = None
+        subtask.is_root = False
+        subtask.update_cached_values()
+        subtask.parent_node = self
+        self._propagate_counts(subtask._counts)
+
+    def allocate_id(self, task_id: int = None) -> int:
+        """Allocates an id, unique within this task's tree
+        :arg task_id: an already existing id, which should be reserved instead of allocating a new one
+        :returns: allocated id
+        """
+        root = self.root_node
+        if task_id is None:
+            task_id = root._last_id + 1
+        root._last_id = max(root._last_id, task_id)
+        return task_id
+
+    def find_by_id(self, task_id: int) -> Union['TaskNode', None]:
+        """Searches for a ``TaskNode`` with id *task_id* in this task's subtree"""
+        node = self.root_node._get_id_index().get(task_id)
+        if node is not None and node.is_descendant_of(self):
+            return node
+        return None
+
+    def _in_subtree(self, tasks) -> filter:
+        return filter(lambda task: self.is_root or task.is_descendant_of(self), tasks)
+
+    def due_on(self, day: date) -> list["TaskNode"]:
+        """Returns tasks of this task's subtree due on *day*"""
+        return list(self._in_subtree(self.root_node._get_deadline_index().due_on(day)))
+
+    def due_between(self, start: date | None, end: date | None) -> list["TaskNode"]:
+        """Returns tasks of this task's subtree due from *start* to *end* (both inclusive), ordered by their deadlines
+        :arg start: first day, ``None`` for no lower bound
+        :arg end: last day, ``None`` for no upper bound
+        """
+        return list(self._in_subtree(self.root_node._get_deadline_index().due_between(start, end)))
+
+    def with_importance(self, *importances: int) -> list["TaskNode"]:
+        """Returns tasks of this task's subtree with one of *importances*, done tasks have ``Importance.DONE``"""
+        buckets = self.root_node._get_importance_index()
+        return [task for importance in importances for task in self._in_subtree(buckets.get(importance, {}).values())]
+
+    def overdue(self) -> list["TaskNode"]:
+        """Returns tasks of this task's subtree, which are not done and were due before today, ordered by their
+        deadlines"""
+        tasks = self.root_node._get_deadline_index().due_between(None, clock.today() - timedelta(days=1))
+        return [task for task in self._in_subtree(tasks) if not task.is_done]
+
+    def next_due(self, count: int, start: date = None) -> list["TaskNode"]:
+        """Returns up to *count* tasks of this task's subtree, which are not done and are due on *start* (today by
+        default) or later, ordered by their deadlines"""
+        if start is None:
+            start = clock.today()
+        tasks = self.root_node._get_deadline_index().due_between(start, None)
+        return list(itertools.islice((task for task in self._in_subtree(tasks) if not task.is_done), count))
+
+    def is_descendant_of(self, other: "TaskNode") -> bool:
+        """``True`` if *other* is this task or one of its parent nodes"""
+        node = self
+        while node is not None:
+            if node is other:
+                return True
+            node = node.parent_node
+        return False
+
     def get_level(self):
         """Returns a nu,ber representing how many parent nodes this task has"""
         level = 0
@@ -221,7 +690,25 @@ class TaskNode:
 
     def remove(self):
         """Deletes this task from its parent's children list, thus removing it (and its subtree) from the tree"""
-        return self.parent_node.child_nodes.remove(self)
+        siblings = self.parent_node.child_nodes
+        for index in range(len(siblings)):
+            if siblings[index] is self:
+                del siblings[index]
+                break
+        else:
+            raise ValueError("task is not in its parent's children list")
+        self.parent_node._propagate_counts(TaskCounts() - self._counts)
+
+        # The removed subtree becomes a tree of its own, with this task as its root node
+        root = self.root_node
+        indexed = root._is_indexed
+        nodes = [self]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            if indexed:
+                root._unindex_node(node)
+            node.root_node = self
+            nodes.extend(node.child_nodes)
 
     @overload
     def find_subtask(self, task: "TaskNode"):
@@ -232,23 +719,20 @@ class TaskNode:
         ...
 
     def find_subtask(self, task) -> Union['TaskNode', bool]:
-        """Searches for a ``TaskNode`` object equal to *task* in this task's subtree
+        """Searches for a ``TaskNode`` object with the same text as *task*, or a duplicate of *task* (see
+        ``is_duplicate_of``) in this task's subtree
         :arg task: a ``TaskNode`` or task text to search for
         :returns: found ``TaskNode`` object; ``False`` if no suitable ``TaskNode`` was found
         """
-        if self.is_root:
-            pass
-        elif isinstance(task, str):
-            if self.text.strip("-") == task.strip("-"):
-                return self
+        if isinstance(task, str):
+            text = task
         elif isinstance(task, TaskNode):
-            if self == task:
-                return self
-        if len(self.child_nodes) == 0:
-            return False
-        for child in self.child_nodes:
-            result = child.find_subtask(task)
-            if result:
-                return result
+            text = task.text
         else:
             return False
+        if text is None:
+            return False
+        for node in self.root_node._find_by_text(text):
+            if (isinstance(task, str) or node.is_duplicate_of(task)) and node.is_descendant_of(self):
+                return node
+        return False
@@ -1,9 +1,11 @@
+import bisect
 import datetime
 import pickle
 from dataclasses import dataclass
 from typing import overload
 
 from OutlinerApp.Backend.configs import session_config
+from OutlinerApp.Backend.intervalIndex import MOMENT, Interval, IntervalIndex
 from OutlinerApp.Backend.tasks import TaskNode
 
 
@@ -15,7 +17,8 @@ class TimetableItem:
     date: datetime.date
     name: str
 
-    TID: int = 0
+    # Assigned by the timetable the item is added to
+    TID: int | None = None
 
     location: str | None = None
     description: str | None = None
@@ -27,8 +30,6 @@ class TimetableItem:
     item_type: NotImplemented = None
 
     def __post_init__(self):
-        self.TID = TimetableItem.TID
-        TimetableItem.TID += 1
         if self.end_time is None:
             self.end_time = self.start_time
 
@@ -42,10 +43,30 @@ class TimetableItem:
             raise AttributeError("Deadline field cannot be None when adding a task to a timetable")
         return TimetableTask(date=task.deadline, name=task.text, task=task)
 
+    def get_sort_key(self) -> tuple:
+        """Key items of a day are ordered by: all-day items (without a start time, e.g. task deadlines) first,
+        then by start time, items starting at the same time in the order they were created in"""
+        return self.start_time is not None, self.start_time or datetime.time(), self.TID
+
     @property
     def is_momentary(self) -> bool:
         return self.start_time == self.end_time
 
+    @property
+    def duration(self) -> datetime.timedelta | None:
+        """Time from the start to the end of the item, ``None`` for all-day items"""
+        if self.start_time is None or self.end_time is None:
+            return None
+        day = datetime.date.min
+        duration = datetime.datetime.combine(day, self.end_time) - datetime.datetime.combine(day, self.start_time)
+        return duration + datetime.timedelta(days=1) if duration < datetime.timedelta() else duration
+
+    @property
+    def is_overnight(self) -> bool:
+        """``True`` if the item ends on the next day, items ending at midnight end on their own day"""
+        return self.start_time is not None and self.end_time is not None and \
+            datetime.time() < self.end_time < self.start_time
+
     def __str__(self):
         return self.name
     # is_recurring: bool
@@ -68,10 +89,33 @@ class TimetableTask(TimetableItem):
 
 
 class Timetable:
+    """Items by their dates, each day's table is ordered by ``TimetableItem.get_sort_key``, days without items are
+    dropped
+
+    Dates of the days with items are kept sorted, so date-range queries take O(log d + result) time, where d is the
+    number of days with items
+    """
     daytables_by_date: dict[datetime.date, list[TimetableItem]]
+    # Dates of daytables_by_date, sorted
+    _dates: list[datetime.date]
+    # Sort keys of the items of each day, in the same order as the items, so bisect compares plain tuples
+    _keys_by_date: dict[datetime.date, list[tuple]]
+    _items_by_tid: dict[int, TimetableItem]
+    # Calendar entries of tasks' deadlines, by the ids of the tasks
+    _items_by_task: dict[int, "TimetableTask"]
+    # Intervals of the timed items of each day, built when the day is first queried and kept up to date afterwards
+    _intervals_by_date: dict[datetime.date, IntervalIndex]
+    _last_tid: int
+    journal_seq: int = 0
 
     def __init__(self):
         self.daytables_by_date = {}
+        self._dates = []
+        self._keys_by_date = {}
+        self._items_by_tid = {}
+        self._items_by_task = {}
+        self._intervals_by_date = {}
+        self._last_tid = 0
 
     def move_item(self, item: TimetableItem, new_date: datetime.date):
         if self.remove_item(item) is None:
@@ -89,14 +133,7 @@ class Timetable:
 
     def find_item(self, *args):
         if len(args)==1 and isinstance(args[0], TaskNode):
-            searchitem = args[0]
-            if searchitem.deadline not in self.daytables_by_date.keys():
-                return None
-            day_timetable = self.daytables_by_date[searchitem.deadline]
-
-            for item in day_timetable:
-                if isinstance(item, TimetableTask) and item.task == searchitem:
-                    return item
+            return self._items_by_task.get(args[0].id)
         if len(args)==2 and isinstance(args[0], datetime.date) and isinstance(args[1], int):
             date = args[0]
             index = args[1]
@@ -107,37 +144,182 @@ class Timetable:
 
         return None
 
-    def add_item(self, new_item: TimetableItem, overwrite_existing: bool = False):
-        if new_item.date in self.daytables_by_date.keys():
-            day_timetable = self.daytables_by_date[new_item.date]
-
-            # Always append tasks to the end of the day's events
-            if isinstance(new_item, TimetableTask):
-                day_timetable.append(new_item)
-                return
-
-            index = -1
-            for item in day_timetable:
-                index += 1
-                if new_item.start_time is None:
-                    day_timetable.insert(0, new_item)
-                    break
-                if item.start_time is None:
-                    day_timetable.insert(index, new_item)
-                    break
-                if item.start_time <= new_item.start_time:
+    def iter_days(self, start: datetime.date = None, end: datetime.date = None):
+        """Lazily yields ``(date, items)`` of the days with items from *start* to *end* (both inclusive), in order
+        :arg start: first day, ``None`` for no lower bound
+        :arg end: last day, ``None`` for no upper bound
+        """
+        first = 0 if start is None else bisect.bisect_left(self._dates, start)
+        last = len(self._dates) if end is None else bisect.bisect_right(self._dates, end)
+        for date in self._dates[first:last]:
+            yield date, self.daytables_by_date[date]
+
+    def items_between(self, start: datetime.date = None, end: datetime.date = None) -> list[TimetableItem]:
+        """Returns items dated from *start* to *end* (both inclusive), ordered by date, then by
+        ``TimetableItem.get_sort_key``"""
+        return [item for date, items in self.iter_days(start, end) for item in items]
+
+    def next_items(self, count: int, after: datetime.datetime) -> list[TimetableItem]:
+        """Returns up to *count* items, which are not over at *after*: all-day items of its day and items going on at
+        or starting after it (including overnight items of the previous day), followed by items of the later days"""
+        found = []
+        day = after.date()
+        items = self.daytables_by_date.get(day)
+        if items is not None:
+            found.extend(items[:bisect.bisect_left(self._keys_by_date[day], (True,))])
+        found.extend(item for _, _, item in self._get_intervals(day).overlapping(_seconds(after.time()), _DAY_SECONDS))
+        if len(found) >= count:
+            return found[:count]
+        for date, items in self.iter_days(day + datetime.timedelta(days=1)):
+            found.extend(items[:count - len(found)])
+            if len(found) >= count:
+                break
+        return found
+
+    def _get_intervals(self, date: datetime.date) -> IntervalIndex:
+        """Returns the interval index of *date*, which also holds the ends of the previous day's overnight items"""
+        index = self._intervals_by_date.get(date)
+        if index is None:
+            intervals = [(*_interval(item), item) for item in self.daytables_by_date.get(date, ())
+                         if item.start_time is not None]
+            for item in self.daytables_by_date.get(date - datetime.timedelta(days=1), ()):
+                # Empty carry-overs (e.g. ending within the first second) are dropped
+                carry_over = self._carry_over(item)
+                if carry_over is not None:
+                    intervals.append(carry_over[1])
+            index = IntervalIndex(intervals)
+            # Days without timed items are not kept, free slots are searched for across many of them
+            if len(intervals) > 0:
+                self._intervals_by_date[date] = index
+        return index
+
+    def _carry_over(self, item: TimetableItem) -> tuple[datetime.date, Interval] | None:
+        """Returns the next day and the interval of *item* on it, if it is overnight"""
+        if item.is_overnight and _seconds(item.end_time) > 0:
+            return item.date + datetime.timedelta(days=1), (0, _seconds(item.end_time), item)
+        return None
+
+    def _index_intervals(self, item: TimetableItem):
+        """Adds the intervals of *item* to the already built indexes, other days are indexed when they are queried"""
+        if item.start_time is None:
+            return
+        index = self._intervals_by_date.get(item.date)
+        if index is not None:
+            index.add((*_interval(item), item))
+        carry_over = self._carry_over(item)
+        if carry_over is not None and carry_over[0] in self._intervals_by_date:
+            self._intervals_by_date[carry_over[0]].add(carry_over[1])
+
+    def _unindex_intervals(self, item: TimetableItem):
+        if item.start_time is None:
+            return
+        for date in (item.date, item.date + datetime.timedelta(days=1)):
+            index = self._intervals_by_date.get(date)
+            if index is not None and index.remove(item) and len(index) == 0:
+                del self._intervals_by_date[date]
+
+    def overlapping(self, date: datetime.date, start: datetime.time, end: datetime.time = None) -> list[TimetableItem]:
+        """Returns timed items of *date*, which overlap the time from *start* to *end* (exclusive), ordered by their
+        starts, items from the previous day lasting overnight included. Momentary items only overlap the times
+        they start in
+        :arg end: end of the time, ``None`` for the moment *start*
+        """
+        start_seconds = _seconds(start)
+        end_seconds = start_seconds + MOMENT if end is None or end == start else _seconds(end)
+        return [item for _, _, item in self._get_intervals(date).overlapping(start_seconds, end_seconds)]
+
+    def conflicts(self, item: TimetableItem) -> list[TimetableItem]:
+        """Returns other items overlapping *item*'s time, all-day items do not conflict with anything"""
+        if item.start_time is None:
+            return []
+        found = self._get_intervals(item.date).overlapping(*_interval(item))
+        if item.is_overnight:
+            next_day = self._get_intervals(item.date + datetime.timedelta(days=1))
+            found += next_day.overlapping(0, _seconds(item.end_time))
+        # Other overnight items may be found on both days
+        return list({id(other): other for _, _, other in found if other is not item}.values())
+
+    def free_slot(self, duration: datetime.timedelta, start: datetime.date, end: datetime.date,
+                  day_start: datetime.time = datetime.time(), day_end: datetime.time = None):
+        """Returns the first moment from *start* to *end* (both inclusive days), when no timed item is going on for
+        *duration*, only looking between *day_start* and *day_end* of each day. Momentary items do not take time
+        :arg day_end: ``None`` for the end of the day
+        :returns: start of the free time, ``None`` if there is none
+        """
+        slot_start = _seconds(day_start)
+        slot_end = _DAY_SECONDS if day_end is None else _seconds(day_end)
+        length = duration.total_seconds()
+        date = start
+        while date <= end:
+            free_from = slot_start
+            for busy_start, busy_end, item in self._get_intervals(date).overlapping(slot_start, slot_end):
+                if item.is_momentary:
                     continue
-                elif item.start_time >= new_item.start_time:
-                    day_timetable.insert(index, new_item)
+                if busy_start - free_from >= length:
                     break
-                else:
-                    raise RuntimeError
-            else:
-                day_timetable.append(new_item)
-        else:
-            day_timetable = [new_item]
+                free_from = max(free_from, busy_end)
+            if slot_end - free_from >= length:
+                return datetime.datetime.combine(date, datetime.time()) + datetime.timedelta(seconds=free_from)
+            date += datetime.timedelta(days=1)
+        return None
 
-            self.daytables_by_date[new_item.date] = day_timetable
+    def find_by_tid(self, tid: int) -> TimetableItem | None:
+        return self._items_by_tid.get(tid)
+
+    def allocate_tid(self, tid: int = None) -> int:
+        """Allocates a TID, unique within this timetable, the last allocated TID is saved along with the timetable,
+        so TIDs of removed items are not reused
+        :arg tid: an already existing TID, which should be reserved instead of allocating a new one, unless another
+            item already has it
+        :returns: allocated TID
+        """
+        if tid is None or tid in self._items_by_tid:
+            tid = self._last_tid + 1
+        self._last_tid = max(self._last_tid, tid)
+        return tid
+
+    def add_item(self, new_item: TimetableItem, overwrite_existing: bool = False):
+        """Inserts *new_item* into its day's table, which is kept ordered by ``TimetableItem.get_sort_key``,
+        allocates a TID for the item, unless it already has one"""
+        new_item.TID = self.allocate_tid(new_item.TID)
+        self._index_item(new_item)
+        self._index_intervals(new_item)
+        key = new_item.get_sort_key()
+        day_timetable = self.daytables_by_date.get(new_item.date)
+        if day_timetable is None:
+            self.daytables_by_date[new_item.date] = [new_item]
+            self._keys_by_date[new_item.date] = [key]
+            bisect.insort(self._dates, new_item.date)
+            return
+        keys = self._keys_by_date[new_item.date]
+        index = bisect.bisect_right(keys, key)
+        day_timetable.insert(index, new_item)
+        keys.insert(index, key)
+
+    def _index_item(self, item: TimetableItem):
+        self._items_by_tid[item.TID] = item
+        if isinstance(item, TimetableTask) and item.task is not None and item.task.id is not None:
+            self._items_by_task[item.task.id] = item
+
+    def _unindex_item(self, item: TimetableItem):
+        del self._items_by_tid[item.TID]
+        if isinstance(item, TimetableTask) and item.task is not None \
+                and self._items_by_task.get(item.task.id) is item:
+            del self._items_by_task[item.task.id]
+
+    def _find_index(self, item: TimetableItem) -> int | None:
+        """Returns the index of *item* (the very object) in its day's table"""
+        items = self.daytables_by_date.get(item.date)
+        if items is None or self._items_by_tid.get(item.TID) is not item:
+            return None
+        keys = self._keys_by_date[item.date]
+        key = item.get_sort_key()
+        index = bisect.bisect_left(keys, key)
+        while index < len(items) and keys[index] == key:
+            if items[index] is item:
+                return index
+            index += 1
+        return None
 
     @overload
     def remove_item(self, timetable_item: TimetableItem):
@@ -152,10 +334,9 @@ class Timetable:
         index: int
         if len(args) == 1 and isinstance(args[0], TimetableItem):
             item_to_remove: TimetableItem = args[0]
-            date = item_to_remove.date
-            if date in self.daytables_by_date.keys():
-                items: list[TimetableItem] = self.daytables_by_date[date]
-                items.remove(item_to_remove)
+            index = self._find_index(item_to_remove)
+            if index is not None:
+                self._remove_at(item_to_remove.date, index)
                 return item_to_remove
 
         if len(args) == 2 and isinstance(args[0], datetime.date) and isinstance(args[1], int):
@@ -164,10 +345,81 @@ class Timetable:
             if date in self.daytables_by_date.keys():
                 items: list[TimetableItem] = self.daytables_by_date[date]
                 if 0 <= index < len(items):
-                    return items.pop(index)
+                    return self._remove_at(date, index)
 
         return None
 
+    def _remove_at(self, date: datetime.date, index: int) -> TimetableItem:
+        items = self.daytables_by_date[date]
+        item = items.pop(index)
+        del self._keys_by_date[date][index]
+        self._unindex_item(item)
+        self._unindex_intervals(item)
+        if len(items) == 0:
+            del self.daytables_by_date[date]
+            del self._keys_by_date[date]
+            del self._dates[bisect.bisect_left(self._dates, date)]
+        return item
+
+    def reindex(self):
+        """Orders the tables of all days and rebuilds the indexes, used for timetables saved by older versions of the
+        app, which could also give the same TID to several items"""
+        self.daytables_by_date = {date: items for date, items in self.daytables_by_date.items() if len(items) > 0}
+        self._dates = sorted(self.daytables_by_date)
+        self._keys_by_date = {}
+        self._items_by_tid = {}
+        self._items_by_task = {}
+        self._intervals_by_date = {}
+        self._last_tid = max((item.TID or 0 for items in self.daytables_by_date.values() for item in items), default=0)
+        for date, items in self.daytables_by_date.items():
+            for item in items:
+                item.TID = self.allocate_tid(item.TID)
+                self._index_item(item)
+            items.sort(key=TimetableItem.get_sort_key)
+            self._keys_by_date[date] = [item.get_sort_key() for item in items]
+
+    def check_invariants(self):
+        """Raises ``AssertionError`` if an item is listed on a day other than its date, or a day's table is not ordered
+        """
+        if self._dates != sorted(self.daytables_by_date):
+            raise AssertionError("sorted dates do not match the days of the timetable")
+        for date, items in self.daytables_by_date.items():
+            if len(items) == 0:
+                raise AssertionError(f"{date} is listed without items")
+            for index in range(len(items)):
+                if items[index].date != date:
+                    raise AssertionError(f"{items[index]} is dated {items[index].date}, but is listed on {date}")
+                if index > 0 and items[index - 1].get_sort_key() > items[index].get_sort_key():
+                    raise AssertionError(f"{items[index - 1]} and {items[index]} on {date} are out of order")
+            if self._keys_by_date.get(date) != [item.get_sort_key() for item in items]:
+                raise AssertionError(f"sort keys of {date} do not match its items")
+            for item in items:
+                if self._items_by_tid.get(item.TID) is not item or item.TID > self._last_tid:
+                    raise AssertionError(f"{item} is not indexed by its TID {item.TID}")
+                if isinstance(item, TimetableTask) and item.task is not None and item.task.id is not None \
+                        and self._items_by_task.get(item.task.id) is not item:
+                    raise AssertionError(f"{item} is not indexed by its task's id {item.task.id}")
+        if len(self._items_by_tid) != sum(len(items) for items in self.daytables_by_date.values()):
+            raise AssertionError("TID index holds items which are not in the timetable")
+
     def load_pickle(self, file):
         new_timetable = pickle.load(file)
         self.daytables_by_date = new_timetable
+        self.reindex()
+
+
+_DAY_SECONDS = 24 * 60 * 60
+
+
+def _seconds(moment: datetime.time) -> int:
+    return moment.hour * 3600 + moment.minute * 60 + moment.second
+
+
+def _interval(item: TimetableItem) -> tuple[float, float]:
+    """Returns the start and the end of a timed *item* on its own day, in seconds since midnight"""
+    start = _seconds(item.start_time)
+    if item.end_time is not None and item.end_time < item.start_time:
+        return start, _DAY_SECONDS
+    if item.end_time is None or item.is_momentary:
+        return start, start + MOMENT
+    return start, _seconds(item.end_time)
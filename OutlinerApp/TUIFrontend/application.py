@@ -4,10 +4,13 @@ import threading
 from watchdog.observers import Observer
 
 from . import userInput
+from ..Backend import clock
+from ..Backend import ioManager
 from .overlays import Overlay
 from .widgets import Widget
 from .outliners import TaskOutliner, CalendarOutliner, AgendaOutliner, DayplanOutliner
 from ..Backend.configs import session_config
+from ..Backend.data import ChangeKind, TaskChange
 from . import partitioner
 
 
@@ -61,12 +64,16 @@ class Application:
         curses.mousemask(curses.BUTTON1_PRESSED)
         curses.set_escdelay(100)
 
-        # ioManager.load_data()
+        # Frames and headers are drawn right away, outliners fill in their contents once the data is loaded
+        ioManager.subscribe(self.on_data_changed)
+        ioManager.load_data_in_background()
+        clock.start()
 
         observer = Observer()
         # observer.schedule(self.input_manager, path=session_config.IOConfig.logseq_dir, recursive=True)
-        observer.schedule(self.input_manager, path=session_config.IOConfig.tasks_file, recursive=True)
-        observer.schedule(self.input_manager, path=session_config.IOConfig.event_file, recursive=True)
+        # Data files are replaced by renaming a temporary file over them, so their directories are watched instead
+        for directory in {path.parent for path in ioManager.data_files()}:
+            observer.schedule(self.input_manager, path=directory, recursive=False)
         observer.start()
 
         self.widgets = []
@@ -88,8 +95,14 @@ class Application:
                 # self.update_render()
                 self.render_thread.render_lock.release()
                 self.input_manager.handle_input()
+                # The error is shown in place of the data, the app exits with it once a key is pressed
+                if ioManager.load_error is not None:
+                    raise ioManager.load_error
         except KeyboardInterrupt:
             self.render_thread.terminate()
+        finally:
+            clock.stop()
+            ioManager.flush()
 
         observer.stop()
         return
@@ -126,12 +139,18 @@ class Application:
         for widget in self.widgets:
             widget.update()
 
+    def on_data_changed(self, changes: list[TaskChange]):
+        if any(change.kind == ChangeKind.RELOADED for change in changes):
+            self.render_thread.render_lock.release()
+
     def update_data_all(self):
         self.stdscr.redrawwin()
         for widget in self.widgets:
             widget.reload_data()
 
     def update_render(self):
+        # Catches a day change the midnight timer has missed, e.g. while the computer was asleep
+        clock.check()
         # TODO Refactor
         # self.stdscr.clear()
         self.stdscr.erase()
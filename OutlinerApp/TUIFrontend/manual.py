@@ -17,6 +17,7 @@ class HelpPage:
             shift+r - rest view
             
             h - hide/unhide done tasks (globally)
+            v - show a saved view or tasks matching a query
             t - toggle deadlines in event calendar 
             T - show today
                        
@@ -5,9 +5,12 @@ import time
 
 from .overlays import EditFieldsOverlay
 from .widgets import Widget, Header
+from ..Backend import clock
 from ..Backend import data
 from ..Backend import ioManager
 from ..Backend.configs import session_config
+from ..Backend.data import ChangeKind, TaskChange
+from ..Backend.query import Query, parse_query
 from ..Backend.tasks import TaskNode
 from ..Backend.timetables import TimetableItem, TimetableTask
 
@@ -47,6 +50,13 @@ class Outliner(Widget):
     def header(self):
         return Header(f"Outliner")
 
+    def render_loading(self):
+        """Draws a placeholder, while the data is being loaded in the background, or the error it could not be loaded
+        with"""
+        text = "Loading..." if ioManager.load_error is None else f"Could not load data: {ioManager.load_error}"
+        self.renderer.render_string(text, self.content_top, self.content_left, self.content_width,
+                                    session_config.ColorsConfig.generic_text_pair)
+
     def edit_entry(self):
         """
         Starts a process of editing an entry of the outliner
@@ -58,13 +68,88 @@ class Outliner(Widget):
 
 
 class TaskOutliner(Outliner):
-    tasks: list[TaskNode]
+    tasks: list[TaskNode] = []
     config = session_config.TaskOutlinerConfig
     ID = 0
+    _stale = True
+    _subscribed = False
+    view_name: str | None = None
+    view: Query | None = None
 
     @staticmethod
     def reload_data():
-        TaskOutliner.tasks = ioManager.get_root_task().get_all_children()
+        if TaskOutliner._stale and ioManager.is_loaded():
+            root_task = ioManager.get_root_task()
+            TaskOutliner._stale = False
+            if TaskOutliner.view is not None:
+                TaskOutliner.tasks = TaskOutliner.view.run(root_task, skip_excluded=True)
+            else:
+                TaskOutliner.tasks = root_task.get_all_children()
+
+    @staticmethod
+    def apply_changes(changes: list[TaskChange]):
+        """Updates only the rows of the task affected by a single change, instead of rebuilding the whole list
+
+        Rows are positioned by the tree after all *changes* were made, so a batch of several changes (e.g. a reload or
+        a bulk update) marks the list for a rebuild instead
+        """
+        if TaskOutliner._stale:
+            return
+        if len(changes) != 1 or changes[0].kind == ChangeKind.RELOADED or TaskOutliner.view is not None:
+            TaskOutliner._stale = True
+            return
+        change = changes[0]
+        TaskOutliner._remove_rows(change.task)
+        if change.kind != ChangeKind.REMOVED and not TaskOutliner._stale:
+            TaskOutliner._insert_rows(change.task)
+
+    @staticmethod
+    def _find_row(task: TaskNode) -> int | None:
+        for row in range(len(TaskOutliner.tasks)):
+            if TaskOutliner.tasks[row] is task:
+                return row
+        return None
+
+    @staticmethod
+    def _subtree_end(row: int) -> int:
+        """Returns the row after the last row of the subtree of the task displayed at *row*"""
+        tasks = TaskOutliner.tasks
+        end = row + 1
+        while end < len(tasks) and tasks[end].is_descendant_of(tasks[row]):
+            end += 1
+        return end
+
+    @staticmethod
+    def _remove_rows(task: TaskNode):
+        row = TaskOutliner._find_row(task)
+        if row is None:
+            if len(task.child_nodes) > 0:
+                # Hidden task, that might have visible subtasks
+                TaskOutliner._stale = True
+            return
+        del TaskOutliner.tasks[row:TaskOutliner._subtree_end(row)]
+
+    @staticmethod
+    def _insert_rows(task: TaskNode):
+        """Inserts rows of *task*'s subtree before the row of the next task displayed after the subtree in pre-order,
+        which may be a subtask of a hidden task"""
+        row = TaskOutliner._next_row(task)
+        TaskOutliner.tasks[row:row] = task.get_all_children()
+
+    @staticmethod
+    def _next_row(task: TaskNode) -> int:
+        """Returns the row of the first displayed task following *task*'s subtree in pre-order"""
+        rows = {id(displayed): row for row, displayed in enumerate(TaskOutliner.tasks)}
+        node = task
+        while node.parent_node is not None:
+            siblings = node.parent_node.child_nodes
+            position = next(index for index in range(len(siblings)) if siblings[index] is node)
+            for sibling in siblings[position + 1:]:
+                for successor in sibling.iter_subtree():
+                    if id(successor) in rows:
+                        return rows[id(successor)]
+            node = node.parent_node
+        return len(TaskOutliner.tasks)
 
     @staticmethod
     def toggle_hide_done():
@@ -73,6 +158,23 @@ class TaskOutliner(Outliner):
             session_config.TaskConfig.exclude_tasks.remove(data.Importance.DONE)
         else:
             session_config.TaskConfig.exclude_tasks.append(data.Importance.DONE)
+        TaskOutliner._stale = True
+
+    def select_view(self):
+        """Prompts the user for a name of a saved view or a query, shows only tasks matching it,
+        shows all tasks again if nothing is entered"""
+        text = self.input_manager.recieve_text("View (name or query): ").strip()
+        if len(text) == 0:
+            TaskOutliner.view_name, TaskOutliner.view = None, None
+        elif text in session_config.TaskConfig.views:
+            TaskOutliner.view_name, TaskOutliner.view = text, session_config.TaskConfig.views[text]
+        else:
+            try:
+                TaskOutliner.view_name, TaskOutliner.view = text, parse_query(text)
+            except ValueError:
+                return
+        self.start_line = 0
+        TaskOutliner._stale = True
 
     @staticmethod
     def _select_color(task) -> int:
@@ -91,6 +193,9 @@ class TaskOutliner(Outliner):
         super().__init__(stdscr, app, x_offset, y_offset)
         self.config = session_config.TaskOutlinerConfig
         self.start_line = 0
+        if not TaskOutliner._subscribed:
+            ioManager.subscribe(TaskOutliner.apply_changes)
+            TaskOutliner._subscribed = True
         self.reload_data()
 
     @property
@@ -99,6 +204,8 @@ class TaskOutliner(Outliner):
 
     @property
     def header(self):
+        if TaskOutliner.view_name is not None:
+            return Header(f"TODO List: {TaskOutliner.view_name}")
         return Header(f"TODO List")
 
     def scroll(self, direction: (int, int)):
@@ -154,14 +261,15 @@ class TaskOutliner(Outliner):
             ioManager.remove_task(task)
         return task
 
-    def mark_done(self) -> TaskNode | None:
-        """Prompts the user to mark a task as done, if a task is selected, toggles its done status
-        :returns: modified TaskNode if user selected a task, None if user chose not to select a task
+    def mark_done(self) -> list[TaskNode]:
+        """Prompts the user to mark tasks as done, selected tasks are marked as done, unless all of them are done
+        already, then they are marked as not done
+        :returns: list of modified TaskNodes, empty if user chose not to select any task
         """
-        task = self.select_task(prompt="Mark as done task number:")
-        if task is not None:
-            ioManager.mark_done(task)
-        return task
+        tasks = self.select_tasks(prompt="Mark as done task numbers:")
+        if len(tasks) > 0:
+            ioManager.set_done(tasks, not all(task.is_done for task in tasks))
+        return tasks
 
     def edit_task(self) -> TaskNode | None:
         """Prompts the user to select and edit a task, if a task selected opens up an edit overlay
@@ -205,17 +313,37 @@ class TaskOutliner(Outliner):
                 return self.tasks[task_num - 1]
         return None
 
+    def select_tasks(self, prompt: str) -> list[TaskNode]:
+        """Prompts the user to select any number of tasks from ones diplayed by the outliner, numbers are separated
+        by spaces or commas
+        :returns: list of selected TaskNodes, empty if user chose not to select any task
+        """
+        TaskOutliner.remove_mode = True
+        self.renderer.update()
+
+        tasks_str = self.input_manager.recieve_text(prompt)
+        TaskOutliner.remove_mode = False
+        tasks = []
+        for task_str in tasks_str.replace(",", " ").split():
+            task_num = int(task_str)
+            if 1 <= task_num <= len(self.tasks):
+                tasks.append(self.tasks[task_num - 1])
+        return tasks
+
     def render(self):
         """Prepares render of the current state of the TaskOutliner, does not refresh the screen"""
+        if not ioManager.is_loaded():
+            self.render_loading()
 
         line = -1 - self.start_line
 
-        for task in self.tasks:
+        for number, task in enumerate(self.tasks, start=1):
             line += 1
             if not self.content_length >= line >= 0:
                 continue
-            output = f"{(str(self.tasks.index(task) + 1) + ' ') if TaskOutliner.remove_mode else ''}" \
-                     f"{task}"
+            # Views are flat lists, so tasks are not indented
+            output = f"{(str(number) + ' ') if TaskOutliner.remove_mode else ''}" \
+                     f"{task if TaskOutliner.view is None else task.icon + task.text}"
             right_limit = self.content_right
             if task.deadline is not None:
                 right_limit = self._render_deadline(line, task)
@@ -232,7 +360,7 @@ class TaskOutliner(Outliner):
     def _render_deadline(self, line, task):
         if task.importance == data.Importance.DONE:
             color = session_config.ColorsConfig.done_pair
-        elif task.deadline < datetime.date.today():
+        elif task.deadline < clock.today():
             color = session_config.ColorsConfig.selected_pair
         else:
             color = session_config.ColorsConfig.deadline_pair
@@ -337,8 +465,13 @@ class CalendarOutliner(Outliner):
         if len(new_event_text) == 0:
             return False
 
-        new_event = TimetableItem(date=new_event_date, name=new_event_text)
-        new_event.start_time = new_event_time
+        new_event = TimetableItem(date=new_event_date, name=new_event_text, start_time=new_event_time)
+        conflicts = ioManager.get_timetable().conflicts(new_event)
+        if len(conflicts) > 0:
+            names = ", ".join(str(event) for event in conflicts)
+            answer = self.input_manager.recieve_text(f"Overlaps with {names}. Add anyway? [y/N] ", charlimit=1)
+            if answer.lower() != "y":
+                return False
         ioManager.add_to_timetable(new_event)
 
     def remove_event(self):
@@ -368,16 +501,23 @@ class CalendarOutliner(Outliner):
         grid_gap = 1
         row = 0
 
+        # Events of the whole month are fetched at once
+        events_by_date = {}
+        if ioManager.is_loaded():
+            first_day = self.open_date.replace(day=1)
+            last_day = first_day.replace(day=calendar.monthrange(first_day.year, first_day.month)[1])
+            events_by_date = dict(ioManager.get_timetable().iter_days(first_day, last_day))
+
         for week in weeks:
             for day in week:
                 if day[0] == 0:
                     continue
-                self._render_cell(column_size, day, grid_gap, row, row_size)
+                self._render_cell(column_size, day, grid_gap, row, row_size, events_by_date)
             row += 1
         self.render_decorations()
         self.window.syncup()
 
-    def _render_cell(self, column_size, day, grid_gap, row, row_size):
+    def _render_cell(self, column_size, day, grid_gap, row, row_size, events_by_date):
         # day: (day_num, weekday_num)
         cell_top = self.content_top + row * row_size
         cell_left = self.content_left + day[1] * column_size
@@ -387,7 +527,7 @@ class CalendarOutliner(Outliner):
         color = session_config.ColorsConfig.generic_text_pair
         if cell_date.weekday() >= 5:
             color = session_config.ColorsConfig.weekend_pair
-        if cell_date == cell_date.today():
+        if cell_date == clock.today():
             color = session_config.ColorsConfig.bright_select
             self.window.addnstr(cell_top, cell_left, " " * (column_size - grid_gap), column_size - 2, curses.color_pair(color))
 
@@ -407,12 +547,8 @@ class CalendarOutliner(Outliner):
         event_count = 0
 
         # If there are no events, there's nothing to draw
-        if cell_date not in ioManager.get_timetable().daytables_by_date.keys():
-            return
-        timetable = ioManager.get_timetable()
-        event_lsit = timetable.daytables_by_date[cell_date]
-        # Same as above
-        if len(event_lsit) == 0:
+        event_lsit = events_by_date.get(cell_date)
+        if not event_lsit:
             return
 
         for event in event_lsit:
@@ -491,46 +627,38 @@ class AgendaOutliner(CalendarOutliner, TaskOutliner):
 
     @property
     def today_events(self) -> list[TimetableItem]:
-        if self.today in ioManager.get_timetable().daytables_by_date:
-            return ioManager.get_timetable().daytables_by_date[self.today]
-        else:
+        if not ioManager.is_loaded():
             return []
+        return ioManager.get_timetable().items_between(self.today, self.today)
 
     @property
     def later_events(self) -> list[TimetableItem]:
         later = self.open_date
-        if later in ioManager.get_timetable().daytables_by_date.keys():
-            return ioManager.get_timetable().daytables_by_date[later]
-        else:
+        if not ioManager.is_loaded():
             return []
+        return ioManager.get_timetable().items_between(later, later)
 
     @property
     def today_tasks(self):
-        tasks_with_deadline = ioManager.get_root_task().get_all_children(with_deadline_only=True)
-        today_tasks = []
-        for task in tasks_with_deadline:
-            if task.deadline == self.today:
-                today_tasks.append(task)
-        return today_tasks
+        if not ioManager.is_loaded():
+            return []
+        return [task for task in ioManager.get_root_task().due_on(self.today) if not task.is_excluded]
 
     @property
     def later_tasks(self):
         later = self.open_date
-        tasks_with_deadline = ioManager.get_root_task().get_all_children(with_deadline_only=True)
-        later_tasks = []
-        for task in tasks_with_deadline:
-            if task.deadline == later:
-                later_tasks.append(task)
-        return later_tasks
+        if not ioManager.is_loaded():
+            return []
+        return [task for task in ioManager.get_root_task().due_on(later) if not task.is_excluded]
 
     @property
     def today(self):
-        return datetime.date.today()
+        return clock.today()
 
     @property
     def header(self):
         widget_title = "Agenda"
-        tomorrow = datetime.date.today() + datetime.timedelta(1)
+        tomorrow = clock.today() + datetime.timedelta(1)
         later = self.open_date
         horizontal_size = ((self.width - 1) // 2) if self.today != later else self.width
         horizontal_size -= 2
@@ -549,7 +677,7 @@ class AgendaOutliner(CalendarOutliner, TaskOutliner):
         return Header(out)
 
     def render(self):
-        columns = (self.open_date != self.open_date.today()) + 1
+        columns = (self.open_date != clock.today()) + 1
         column_width = self.content_width // columns
 
         divider = "·"
@@ -560,6 +688,9 @@ class AgendaOutliner(CalendarOutliner, TaskOutliner):
 
         line_count = 0  # used for calculating self.line_count to limit scrolling
 
+        if not ioManager.is_loaded():
+            self.render_loading()
+
         for column in range(columns):
             line = 0 - self.start_line
 
@@ -1,4 +1,6 @@
 import curses
+import threading
+from pathlib import Path
 from typing import List
 
 import watchdog
@@ -10,16 +12,48 @@ from .data import Bounds, Point
 from .outliners import TaskOutliner, CalendarOutliner, Outliner
 from .overlays import SelectorOverlay
 from .widgets import Widget, Header
+from ..Backend import ioManager
 from ..Backend.configs import session_config
 
 
 class InputManager(FileSystemEventHandler):
 
+    @staticmethod
+    def is_external_change(path) -> bool:
+        """``True`` if *path* is a data file, that was changed by another program"""
+        return Path(path) in ioManager.data_files() and not ioManager.is_own_write(path)
+
     def on_modified(self, event):
         event: watchdog.events.FileSystemEvent
+        if self.is_external_change(event.src_path):
+            self.schedule_reload()
+
+    def on_created(self, event):
+        event: watchdog.events.FileSystemEvent
+        # Data files replaced by other programs (or deleted and written again) are new files
+        if self.is_external_change(event.src_path):
+            self.schedule_reload()
+
+    def on_moved(self, event):
+        event: watchdog.events.FileSystemMovedEvent
+        if self.is_external_change(event.dest_path):
+            self.schedule_reload()
+
+    def schedule_reload(self):
+        """Reloads the data once the files have not been changed for ``reload_delay`` seconds,
+        so a burst of changes causes a single reload"""
+        if self._reload_timer is not None:
+            self._reload_timer.cancel()
+        self._reload_timer = threading.Timer(session_config.IOConfig.reload_delay, self.reload_data)
+        self._reload_timer.daemon = True
+        self._reload_timer.start()
+
+    def reload_data(self):
+        ioManager.reload()
         self.app.update_data_all()
 
     def __init__(self, app, window):
+        self._reload_timer: threading.Timer | None = None
         self.focused: Widget = None
         self.app: application.Application = app
         self.window: curses.window = window
@@ -85,6 +119,9 @@ class InputManager(FileSystemEventHandler):
             if key == ord("h"):
                 self.focused.toggle_hide_done()
                 return
+            if key == ord("v"):
+                self.focused.select_view()
+                return
 
             if key == ord("d"):
                 self.focused.mark_done()
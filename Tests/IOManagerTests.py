@@ -0,0 +1,454 @@
+import datetime
+import os
+import random
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+
+from OutlinerApp.Backend import clock, ioManager, storage
+from OutlinerApp.Backend.configs import session_config
+from OutlinerApp.Backend.data import ChangeKind
+from OutlinerApp.Backend.tasks import TaskNode
+from OutlinerApp.Backend.timetables import TimetableItem
+from OutlinerApp.TUIFrontend.outliners import TaskOutliner
+
+
+class IOManagerTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        path = Path(self.directory.name)
+        session_config.IOConfig.tasks_file = path / "tasks.pkl"
+        session_config.IOConfig.event_file = path / "events.pkl"
+        session_config.IOConfig.journal_file = path / "tasks.journal"
+        session_config.IOConfig.database_file = path / "outliner.sqlite"
+        session_config.IOConfig.storage_backend = "files"
+        session_config.IOConfig.tasks_file.touch()
+        session_config.IOConfig.event_file.touch()
+        self.reload()
+
+    def tearDown(self):
+        ioManager.flush()
+        self.directory.cleanup()
+
+    @staticmethod
+    def reload():
+        ioManager._root_task = None
+        ioManager._timetable = None
+        ioManager.load_data()
+
+    def test_journal_replay(self):
+        ioManager.add_subtask(TaskNode("Parent"))
+        parent = ioManager.get_root_task().find_subtask("Parent")
+        ioManager.add_subtask(TaskNode("Child", deadline=datetime.date(2030, 1, 1)), parent)
+        ioManager.mark_done(parent.find_subtask("Child"))
+        ioManager.add_to_timetable(TimetableItem(date=datetime.date(2030, 1, 2), name="Event"))
+        self.assertEqual(session_config.IOConfig.tasks_file.stat().st_size, 0)
+
+        self.reload()
+
+        child = ioManager.get_root_task().find_subtask("Child")
+        self.assertTrue(child.is_done)
+        self.assertEqual(child.parent_node.text, "Parent")
+        self.assertEqual(ioManager.get_timetable().find_item(datetime.date(2030, 1, 2), 0).name, "Event")
+        self.assertIsNotNone(ioManager.get_timetable().find_item(child))
+
+    def test_torn_journal_tail(self):
+        huge_frame = b"\x80\x05\x95" + (2 ** 62).to_bytes(8, "little")
+        tails = ioManager._journal.make_record("add_subtask", 0, 100, "Torn", None, 0)[:20], huge_frame
+        for count, tail in enumerate(tails, 1):
+            ioManager.add_subtask(TaskNode(f"Before {count}"))
+            ioManager.flush()
+            with open(session_config.IOConfig.journal_file, "ab") as file:
+                file.write(tail)
+            self.reload()
+            ioManager.add_subtask(TaskNode(f"After {count}"))
+            ioManager.flush()
+
+            self.reload()
+
+            self.assertTrue(ioManager.get_root_task().find_subtask(f"After {count}"))
+
+    def test_write_behind(self):
+        ioManager.add_subtask(TaskNode("First"))
+        ioManager.add_subtask(TaskNode("Second"))
+        self.assertEqual(session_config.IOConfig.journal_file.stat().st_size if
+                         session_config.IOConfig.journal_file.exists() else 0, 0)
+        ioManager.flush()
+        self.assertEqual(len(list(ioManager._journal.records())), 2)
+
+    def test_transaction(self):
+        with ioManager.transaction():
+            for index in range(10):
+                ioManager.add_subtask(TaskNode(f"Task {index}"))
+            with ioManager.transaction():
+                ioManager.mark_done(ioManager.get_root_task().find_subtask("Task 0"))
+        ioManager.flush()
+        self.assertEqual(len(list(ioManager._journal.records())), 1)
+
+        self.reload()
+
+        self.assertEqual(len(ioManager.get_root_task().child_nodes), 10)
+        self.assertTrue(ioManager.get_root_task().find_subtask("Task 0").is_done)
+
+    def test_bulk_set_done(self):
+        with ioManager.transaction():
+            for index in range(5):
+                ioManager.add_subtask(TaskNode(f"Task {index}"))
+            first = ioManager.get_root_task().find_subtask("Task 1")
+            ioManager.add_subtask(TaskNode("Subtask", deadline=datetime.date(2030, 1, 1)), first)
+        ioManager.flush()
+        records = len(list(ioManager._journal.records()))
+        changes = []
+        ioManager.subscribe(changes.append)
+        tasks = [ioManager.get_root_task().find_subtask(text) for text in ("Task 1", "Task 3")]
+        ioManager.set_done(tasks)
+        ioManager._subscribers.remove(changes.append)
+        ioManager.flush()
+        self.assertEqual(len(list(ioManager._journal.records())), records + 1)
+        self.assertEqual(len(changes), 1)
+        self.assertEqual([task.text for task in ioManager.get_root_task().child_nodes][-2:], ["Task 1", "Task 3"])
+
+        self.reload()
+
+        root = ioManager.get_root_task()
+        self.assertEqual(root.counts.done, 3)
+        self.assertTrue(ioManager.get_timetable().find_item(root.find_subtask("Subtask")).task.is_done)
+
+        changes = []
+        ioManager.subscribe(changes.extend)
+        ioManager.set_done([root.find_subtask(text) for text in ("Task 1", "Task 2")])
+        ioManager.set_done([root.find_subtask("Task 1")])
+        ioManager._subscribers.remove(changes.extend)
+        self.assertEqual([change.task.text for change in changes], ["Task 2"])
+        ioManager.flush()
+        self.assertEqual(list(ioManager._journal.records())[-1][1:],
+                         ("set_done", ([root.find_subtask("Task 2").id], True)))
+
+    def test_task_deadline_on_calendar(self):
+        ioManager.add_subtask(TaskNode("Parent", deadline=datetime.date(2030, 1, 1)))
+        parent = ioManager.get_root_task().find_subtask("Parent")
+        ioManager.add_subtask(TaskNode("Child", deadline=datetime.date(2030, 1, 2)), parent)
+        child = parent.find_subtask("Child")
+        timetable = ioManager.get_timetable()
+        item = timetable.find_item(child)
+        tid = item.TID
+
+        ioManager.edit_task(child, new_deadline=datetime.date(2030, 2, 1))
+        self.assertIs(timetable.find_item(child), item)
+        self.assertEqual((item.date, item.TID), (datetime.date(2030, 2, 1), tid))
+        ioManager.edit_task(child, new_deadline="")
+        self.assertIsNone(timetable.find_item(child))
+        ioManager.edit_task(child, new_deadline=datetime.date(2030, 1, 3))
+
+        ioManager.remove_task(parent)
+        self.assertIsNone(timetable.find_item(child))
+        self.assertEqual(sum(len(items) for items in timetable.daytables_by_date.values()), 0)
+        timetable.check_invariants()
+
+    def test_edit_event_keeps_duration(self):
+        date = datetime.date(2030, 1, 1)
+        event = TimetableItem(date, "Meeting", start_time=datetime.time(14), end_time=datetime.time(15, 30))
+        ioManager.add_to_timetable(event)
+        ioManager.edit_event(event, TimetableItem(date, "Meeting", start_time=datetime.time(23)))
+        self.assertEqual(event.end_time, datetime.time(0, 30))
+        self.assertEqual(ioManager.get_timetable().overlapping(date + datetime.timedelta(days=1), datetime.time(0)),
+                         [event])
+
+    def test_edit_event_persists_end_time(self):
+        for backend in ("files", "sqlite"):
+            session_config.IOConfig.storage_backend = backend
+            self.reload()
+            date = datetime.date(2030, 1, 1)
+            event = TimetableItem(date, backend, start_time=datetime.time(10), end_time=datetime.time(11))
+            ioManager.add_to_timetable(event)
+            ioManager.flush()
+            ioManager.edit_event(event, TimetableItem(date, backend, start_time=datetime.time(14)))
+            ioManager.flush()
+
+            self.reload()
+
+            event = ioManager.get_timetable().find_by_tid(event.TID)
+            self.assertEqual((event.start_time, event.end_time), (datetime.time(14), datetime.time(15)))
+            self.assertFalse(event.is_overnight)
+        ioManager._journal.close()
+
+    def test_deadline_entries_are_not_removed(self):
+        for backend in ("files", "sqlite"):
+            session_config.IOConfig.storage_backend = backend
+            self.reload()
+            ioManager.add_subtask(TaskNode(backend, deadline=datetime.date(2030, 1, 1)))
+            task = ioManager.get_root_task().find_subtask(backend)
+            ioManager.remove_from_timetable(ioManager.get_timetable().find_item(task))
+            self.assertIsNotNone(ioManager.get_timetable().find_item(task))
+            ioManager.flush()
+
+            self.reload()
+
+            self.assertIsNotNone(ioManager.get_timetable().find_item(ioManager.get_root_task().find_subtask(backend)))
+        ioManager._journal.close()
+
+    def test_outliner_rows_match_rebuild(self):
+        random.seed(0)
+        for index in range(3):
+            ioManager.add_subtask(TaskNode(f"Root {index}"))
+        TaskOutliner._stale = True
+        TaskOutliner.reload_data()
+        ioManager.subscribe(TaskOutliner.apply_changes)
+        try:
+            for step in range(300):
+                tasks = ioManager.get_root_task().get_all_children() + \
+                        list(ioManager.get_root_task().iter_subtree(skip_excluded=False))
+                task = random.choice(tasks)
+                match random.randrange(5):
+                    case 0 | 1:
+                        ioManager.add_subtask(TaskNode(f"Task {step}"), task)
+                    case 2:
+                        if not task.is_root:
+                            ioManager.mark_done(task)
+                    case 3:
+                        ioManager.set_done(random.sample(tasks, 2), random.random() < 0.5)
+                    case 4:
+                        if not task.is_root and random.random() < 0.3:
+                            ioManager.remove_task(task)
+                if TaskOutliner._stale:
+                    TaskOutliner.reload_data()
+                self.assertEqual([id(task) for task in TaskOutliner.tasks],
+                                 [id(task) for task in ioManager.get_root_task().get_all_children()])
+        finally:
+            ioManager._subscribers.remove(TaskOutliner.apply_changes)
+
+    def test_skip_unchanged_store(self):
+        ioManager.add_subtask(TaskNode("Task"))
+        skipped_writes = ioManager.skipped_writes
+        ioManager.compact()
+        self.assertEqual(ioManager.skipped_writes, skipped_writes + 1)
+        self.assertEqual(session_config.IOConfig.event_file.stat().st_size, 0)
+
+    def test_own_writes(self):
+        ioManager.add_subtask(TaskNode("Task"))
+        ioManager.compact()
+        self.assertTrue(ioManager.is_own_write(session_config.IOConfig.tasks_file))
+        with open(session_config.IOConfig.tasks_file, "ab") as file:
+            file.write(b"external change")
+        self.assertFalse(ioManager.is_own_write(session_config.IOConfig.tasks_file))
+
+    def test_incremental_reload(self):
+        for text in ("Kept", "Edited", "Removed"):
+            ioManager.add_subtask(TaskNode(text, deadline=datetime.date(2030, 1, 1)))
+        ioManager.compact()
+        kept = ioManager.get_root_task().find_subtask("Kept")
+        edited = ioManager.get_root_task().find_subtask("Edited")
+
+        external_root = storage.load_tasks(session_config.IOConfig.tasks_file.read_bytes())
+        external_root.find_subtask("Edited").text = "Edited externally"
+        external_root.find_subtask("Removed").remove()
+        external_root.add_subtask(TaskNode("Inserted"))
+        session_config.IOConfig.tasks_file.write_bytes(storage.dump_tasks(external_root))
+
+        changes = []
+        ioManager.subscribe(changes.extend)
+        ioManager.reload()
+        ioManager._subscribers.remove(changes.extend)
+
+        root = ioManager.get_root_task()
+        self.assertIs(root.find_subtask("Kept"), kept)
+        self.assertIs(root.find_subtask("Edited externally"), edited)
+        self.assertFalse(root.find_subtask("Removed"))
+        self.assertTrue(root.find_subtask("Inserted"))
+        self.assertEqual(sorted(change.kind.value for change in changes), ["changed", "inserted", "removed"])
+        timetable = ioManager.get_timetable()
+        self.assertIs(timetable.find_item(kept).task, kept)
+        self.assertIs(timetable.find_item(edited).task, edited)
+        self.assertEqual(len(timetable.items_between()), 2)
+        timetable.check_invariants()
+
+    def test_compaction(self):
+        ioManager.add_subtask(TaskNode("Task"))
+        ioManager.compact()
+        self.assertEqual(session_config.IOConfig.journal_file.stat().st_size, 0)
+        ioManager.remove_task(ioManager.get_root_task().find_subtask("Task"))
+
+        self.reload()
+
+        self.assertFalse(ioManager.get_root_task().find_subtask("Task"))
+
+    def test_crash_before_journal_truncation(self):
+        ioManager.add_subtask(TaskNode("Removed"))
+        ioManager.add_to_timetable(TimetableItem(date=datetime.date(2030, 1, 1), name="Event"))
+        ioManager.compact()
+        ioManager.add_subtask(TaskNode("Kept"))
+        ioManager.remove_task(ioManager.get_root_task().find_subtask("Removed"))
+        ioManager.flush()
+        # Only the tasks are written, then the app crashes before the journal is truncated
+        truncate, ioManager._journal.truncate = ioManager._journal.truncate, lambda: None
+        try:
+            ioManager.compact()
+        finally:
+            ioManager._journal.truncate = truncate
+
+        self.reload()
+
+        self.assertEqual([task.text for task in ioManager.get_root_task().child_nodes], ["Kept"])
+        self.assertEqual(ioManager.get_timetable().find_item(datetime.date(2030, 1, 1), 0).name, "Event")
+
+    def test_crash_between_renames(self):
+        ioManager.add_subtask(TaskNode("Old"))
+        ioManager.compact()
+        ioManager.add_subtask(TaskNode("New"))
+        ioManager.add_to_timetable(TimetableItem(date=datetime.date(2030, 1, 1), name="Event"))
+        ioManager.flush()
+        # The events file is replaced, then the app crashes before the tasks file is
+        replace = os.replace
+
+        def crash_on_tasks(source, destination):
+            if Path(destination) == session_config.IOConfig.tasks_file:
+                raise KeyboardInterrupt
+            replace(source, destination)
+
+        os.replace = crash_on_tasks
+        try:
+            with self.assertRaises(KeyboardInterrupt):
+                ioManager.compact()
+        finally:
+            os.replace = replace
+
+        self.reload()
+
+        self.assertEqual(sorted(task.text for task in ioManager.get_root_task().child_nodes), ["New", "Old"])
+        self.assertEqual(len(ioManager.get_timetable().items_between()), 1)
+
+    def test_timetable_records(self):
+        date = datetime.date(2030, 1, 2)
+        event = TimetableItem(date, "Meeting", location="Office", start_time=datetime.time(9),
+                              end_time=datetime.time(10))
+        ioManager.add_to_timetable(event)
+        ioManager.flush()
+        self.assertEqual(list(ioManager._journal.records())[-1][1:],
+                         ("add_to_timetable", (event.TID, date, "Meeting", datetime.time(9), datetime.time(10),
+                                               "Office", None, None)))
+        # Records written by older versions hold the item itself
+        ioManager._journal.append("add_to_timetable", TimetableItem(date, "Legacy", 100))
+
+        self.reload()
+
+        timetable = ioManager.get_timetable()
+        self.assertEqual(timetable.find_by_tid(event.TID), event)
+        self.assertEqual(timetable.find_by_tid(100).name, "Legacy")
+
+    def test_replay_missing_tasks(self):
+        ioManager.add_subtask(TaskNode("Task"))
+        ioManager.flush()
+        ioManager._journal.append("remove_task", 100)
+        ioManager._journal.append("set_done", [100], True)
+        ioManager._journal.append("remove_from_timetable", 100)
+
+        self.reload()
+
+        self.assertTrue(ioManager.get_root_task().find_subtask("Task"))
+
+    def test_background_loading(self):
+        ioManager.add_subtask(TaskNode("Task"))
+        ioManager.flush()
+        ioManager._root_task = None
+        ioManager._timetable = None
+        changes = []
+        ioManager.subscribe(changes.extend)
+        ioManager.load_data_in_background()
+
+        self.assertTrue(ioManager.get_root_task().find_subtask("Task"))
+        self.assertTrue(ioManager.is_loaded())
+        ioManager._loader.join()
+        ioManager._subscribers.remove(changes.extend)
+        self.assertEqual([change.kind for change in changes], [ChangeKind.RELOADED])
+
+    def test_change_while_loading(self):
+        ioManager._root_task = None
+        ioManager._timetable = None
+        load_data = ioManager.load_data
+
+        def slow_load_data():
+            time.sleep(0.1)
+            load_data()
+
+        ioManager.load_data = slow_load_data
+        try:
+            ioManager.load_data_in_background()
+            adding = threading.Thread(target=ioManager.add_subtask, args=(TaskNode("Task"),), daemon=True)
+            adding.start()
+            adding.join(timeout=5)
+        finally:
+            ioManager.load_data = load_data
+        self.assertFalse(adding.is_alive())
+        self.assertTrue(ioManager.get_root_task().find_subtask("Task"))
+
+    def test_background_loading_error(self):
+        ioManager._root_task = None
+        ioManager._timetable = None
+        session_config.IOConfig.tasks_file.write_bytes(b"corrupted")
+        changes = []
+        ioManager.subscribe(changes.extend)
+        ioManager.load_data_in_background().join()
+        ioManager._subscribers.remove(changes.extend)
+
+        self.assertIsNotNone(ioManager.load_error)
+        self.assertFalse(ioManager.is_loaded())
+        self.assertEqual([change.kind for change in changes], [ChangeKind.RELOADED])
+        session_config.IOConfig.tasks_file.write_bytes(b"")
+        ioManager.load_data_in_background().join()
+        self.assertIsNone(ioManager.load_error)
+
+    def test_day_rollover(self):
+        today = clock.today()
+        ioManager.add_subtask(TaskNode("Task", deadline=today + datetime.timedelta(days=1)))
+        task = ioManager.get_root_task().find_subtask("Task")
+        self.assertEqual(ioManager.get_root_task().counts.overdue, 0)
+        changes = []
+        ioManager.subscribe(changes.extend)
+        try:
+            self.assertTrue(clock.check(today + datetime.timedelta(days=2)))
+            self.assertFalse(clock.check(today + datetime.timedelta(days=2)))
+            self.assertEqual(ioManager.get_root_task().counts.overdue, 1)
+            self.assertEqual(task.sort_key[0], -task.priority)
+            self.assertEqual([change.kind for change in changes], [ChangeKind.RELOADED])
+        finally:
+            ioManager._subscribers.remove(changes.extend)
+            clock.check(today)
+
+    def test_sqlite_backend(self):
+        ioManager.add_subtask(TaskNode("Imported", deadline=datetime.date(2030, 1, 1)))
+        ioManager.flush()
+        session_config.IOConfig.storage_backend = "sqlite"
+        self.reload()
+
+        imported = ioManager.get_root_task().find_subtask("Imported")
+        self.assertTrue(imported)
+        ioManager.add_subtask(TaskNode("Child"), imported)
+        ioManager.mark_done(imported)
+        ioManager.edit_task(imported, "Edited", datetime.date(2030, 1, 2))
+        ioManager.add_to_timetable(TimetableItem(date=datetime.date(2030, 1, 3), name="Event"))
+        ioManager.flush()
+        self.assertEqual(ioManager._journal.task_ids_due(datetime.date(2030, 1, 2)), [imported.id])
+
+        self.reload()
+
+        edited = ioManager.get_root_task().find_subtask("Edited")
+        self.assertTrue(edited.is_done)
+        self.assertTrue(edited.find_subtask("Child").is_done)
+        self.assertIsNotNone(ioManager.get_timetable().find_item(edited))
+        event = ioManager.get_timetable().find_item(datetime.date(2030, 1, 3), 0)
+        self.assertEqual(event.name, "Event")
+
+        ioManager.remove_from_timetable(event)
+        ioManager.remove_task(edited)
+        self.reload()
+
+        self.assertEqual(len(ioManager.get_root_task().child_nodes), 0)
+        self.assertIsNone(ioManager.get_timetable().find_item(datetime.date(2030, 1, 3), 0))
+        ioManager._journal.close()
+        session_config.IOConfig.storage_backend = "files"
+
+
+if __name__ == '__main__':
+    unittest.main()
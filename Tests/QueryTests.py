@@ -0,0 +1,75 @@
+import datetime
+import unittest
+
+from OutlinerApp.Backend.data import Importance
+from OutlinerApp.Backend.query import Query, parse_query
+from OutlinerApp.Backend.tasks import TaskNode
+
+
+class QueryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.root = TaskNode()
+        self.root.id = 0
+        importances = (Importance.DOING_A, Importance.TODO_B, Importance.WAITING_C)
+        for index in range(30):
+            deadline = self.today + datetime.timedelta(days=index - 10) if index % 3 != 2 else None
+            self.root.add_subtask(TaskNode(f"Task {index}", deadline, importances[index % 3]))
+        self.project = self.root.find_subtask("Task 0")
+        self.project.add_subtask(TaskNode("Write report", self.today, Importance.DOING_A))
+        self.root.find_subtask("Task 12").set_done()
+
+    def texts(self, query: str) -> set[str]:
+        return {task.text for task in parse_query(query).run(self.root)}
+
+    def test_parse(self):
+        self.assertEqual(parse_query("is:doing_a,todo due:week"),
+                         Query(importances=frozenset({Importance.DOING_A, Importance.TODO_A, Importance.TODO_B,
+                                                      Importance.TODO_C}), due_from=0, due_to=6))
+        self.assertEqual(parse_query('"write report" done:no'), Query(done=False, texts=("write report",)))
+        self.assertEqual(parse_query("due:2030-01-01..").due_from, datetime.date(2030, 1, 1))
+        # Examples from config.ini
+        self.assertEqual(parse_query("importance:doing due:week").due_to, 6)
+        self.assertEqual(parse_query("due:overdue"), Query(due_to=-1, done=False))
+        for query in ("importance:urgent", "due:someday", "color:red", "done:maybe", "done:yes done:no", '"text',
+                      "due:overdue done:yes", "done:no due:overdue", "due:..week"):
+            with self.assertRaises(ValueError):
+                parse_query(query)
+
+    def test_importance(self):
+        self.assertEqual(self.texts("importance:doing_a"), {f"Task {index}" for index in range(0, 30, 3)}
+                         - {"Task 12"} | {"Write report"})
+        self.assertEqual(self.texts("is:done"), {"Task 12"})
+        self.assertEqual(self.texts("is:doing done:yes"), set())
+
+    def test_deadline(self):
+        self.assertEqual(self.texts("is:doing_a due:week"), {"Task 15", "Write report"})
+        self.assertEqual(self.texts("due:today"), {"Task 10", "Write report"})
+        self.assertEqual(self.texts("due:overdue"), {f"Task {index}" for index in range(10) if index % 3 != 2})
+        self.assertEqual(len(self.texts("due:none")), 10)
+        self.assertEqual(self.texts("due:-1..+1 is:todo_b"), {"Task 10"})
+
+    def test_text_and_subtree(self):
+        self.assertEqual(self.texts("report"), {"Write report"})
+        self.assertEqual(self.texts('"task 2"'), {"Task 2"} | {f"Task {index}" for index in range(20, 30)})
+        self.assertEqual(self.texts('under:"Task 0"'), {"Write report"})
+        self.assertEqual(self.texts("under:Missing"), set())
+
+    def test_excluded(self):
+        self.root.find_subtask("Task 3").set_done()
+        done = {task.text for task in parse_query("is:done").run(self.root, skip_excluded=True)}
+        # Done tasks are only hidden once their deadlines have passed
+        self.assertEqual(done, {"Task 12"})
+        self.assertNotIn("Task 3", {task.text for task in parse_query("task").run(self.root, skip_excluded=True)})
+
+    def test_updates(self):
+        self.root.find_subtask("Task 3").set_done()
+        self.assertNotIn("Task 3", self.texts("is:doing_a"))
+        self.assertEqual(self.texts("is:done"), {"Task 3", "Task 12"})
+        self.project.remove()
+        self.assertEqual(self.texts("report"), set())
+        self.assertNotIn("Task 0", self.texts("is:doing_a"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import datetime
+import pickle
+import unittest
+
+from OutlinerApp.Backend import storage
+from OutlinerApp.Backend.data import Importance
+from OutlinerApp.Backend.tasks import TaskNode
+from OutlinerApp.Backend.timetables import Timetable, TimetableItem, TimetableTask
+
+
+class StorageTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = TaskNode()
+        self.root.id = 0
+        self.parent = TaskNode("Parent", importance=Importance.DOING_A)
+        self.root.add_subtask(self.parent)
+        self.child = TaskNode("Child", deadline=datetime.date(2030, 5, 17))
+        self.parent.add_subtask(self.child)
+        self.child.set_done()
+
+    def test_tasks_round_trip(self):
+        root = storage.load_tasks(storage.dump_tasks(self.root))
+
+        parent = root.find_by_id(self.parent.id)
+        child = root.find_by_id(self.child.id)
+        self.assertEqual(parent.text, "Parent")
+        self.assertEqual(parent.importance, Importance.DOING_A)
+        self.assertIs(child.parent_node, parent)
+        self.assertEqual(child.deadline, datetime.date(2030, 5, 17))
+        self.assertTrue(child.is_done)
+        self.assertEqual(child.ident_level, 1)
+        self.assertEqual(root._last_id, self.root._last_id)
+
+    def test_timetable_round_trip(self):
+        timetable = Timetable()
+        event = TimetableItem(date=datetime.date(2030, 5, 17), name="Event", location="Room",
+                              start_time=datetime.time(9, 30))
+        timetable.add_item(event)
+        timetable.add_item(TimetableItem.from_task_with_deadline(self.child))
+
+        loaded = storage.load_timetable(storage.dump_timetable(timetable), {self.child.id: self.child})
+
+        items = loaded.daytables_by_date[datetime.date(2030, 5, 17)]
+        self.assertEqual(items[1].name, "Event")
+        self.assertEqual(items[1].location, "Room")
+        self.assertEqual(items[1].start_time, datetime.time(9, 30))
+        self.assertEqual(items[1].TID, event.TID)
+        self.assertIsInstance(items[0], TimetableTask)
+        self.assertIs(items[0].task, self.child)
+        loaded.check_invariants()
+
+    def test_timetable_last_tid(self):
+        timetable = Timetable()
+        for index in range(3):
+            timetable.add_item(TimetableItem(date=datetime.date(2030, 5, 17), name=f"Event {index}"))
+        removed = timetable.remove_item(datetime.date(2030, 5, 17), 2)
+
+        loaded = storage.load_timetable(storage.dump_timetable(timetable), {})
+
+        self.assertIs(loaded.find_by_tid(1), loaded.find_item(datetime.date(2030, 5, 17), 0))
+        self.assertIsNone(loaded.find_by_tid(removed.TID))
+        item = TimetableItem(date=datetime.date(2030, 5, 18), name="New event")
+        loaded.add_item(item)
+        self.assertGreater(item.TID, removed.TID)
+        loaded.check_invariants()
+
+    def test_timetable_version_1(self):
+        timetable = Timetable()
+        timetable.add_item(TimetableItem(date=datetime.date(2030, 5, 17), name="Event"))
+        data = storage.dump_timetable(timetable)
+        header = storage._EVENTS_HEADER.unpack_from(data)
+        data = storage._EVENTS_HEADER_V1.pack(header[0], 1, *header[2:4], *header[5:]) + \
+            data[storage._EVENTS_HEADER.size:]
+
+        loaded = storage.load_timetable(data, {})
+
+        self.assertEqual(loaded.find_by_tid(1).name, "Event")
+
+    def test_legacy_pickle(self):
+        data = pickle.dumps(self.root)
+
+        self.assertTrue(storage.is_legacy(data))
+        self.assertEqual(storage.load_tasks(data).find_by_id(self.child.id).text, "Child")
+
+    def test_legacy_state(self):
+        # State of a task pickled before tasks had slots, ids and cached values
+        task = TaskNode.__new__(TaskNode)
+        task.__setstate__({"is_root": False, "root_node": None, "ident_level": 0, "text": "Old task",
+                           "parent_node": None, "child_nodes": [], "deadline": None, "_importance": 15,
+                           "_is_done": True, "removed_attribute": 1})
+
+        self.assertEqual(task.text, "Old task")
+        self.assertTrue(task.is_done)
+        self.assertIsNone(task.id)
+        self.assertEqual(task.get_sort_key(datetime.date.today()), (-1, "Old task"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,196 @@
+import datetime
+import unittest
+
+from OutlinerApp.Backend.data import TaskCounts
+from OutlinerApp.Backend.tasks import TaskNode
+
+
+class TaskCountsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = TaskNode()
+        self.root.id = 0
+        self.parent = TaskNode("Parent")
+        self.root.add_subtask(self.parent)
+        self.child = TaskNode("Child", deadline=datetime.date.today() - datetime.timedelta(days=1))
+        self.parent.add_subtask(self.child)
+        self.root.add_subtask(TaskNode("Other"))
+
+    def assertCountsFresh(self):
+        cached = [node._counts for node in (self.root, self.parent, self.child)]
+        self.root.refresh_counts()
+        self.assertEqual(cached, [node._counts for node in (self.root, self.parent, self.child)])
+
+    def test_counts(self):
+        self.assertEqual(self.root.counts, TaskCounts(total=3, done=0, excluded=0, overdue=1))
+        self.assertEqual(self.parent.counts, TaskCounts(total=2, done=0, excluded=0, overdue=1))
+        self.assertEqual(self.root.total_children, 3)
+
+    def test_set_done(self):
+        self.parent.set_done()
+        self.assertEqual(self.root.counts, TaskCounts(total=3, done=2, excluded=2, overdue=0))
+        self.assertCountsFresh()
+
+    def test_set_done_many(self):
+        other = self.root.find_subtask("Other")
+        changed = TaskNode.set_done_many([self.parent, self.child, other])
+        self.assertEqual(len(changed), 3)
+        self.assertEqual(self.root.counts, TaskCounts(total=3, done=3, excluded=3, overdue=0))
+        self.assertCountsFresh()
+        self.assertEqual(TaskNode.set_done_many([self.parent]), [])
+        TaskNode.set_done_many([self.child], is_done=False, affect_children=False)
+        self.assertFalse(self.child.is_done)
+        self.assertTrue(self.parent.is_done)
+        self.assertCountsFresh()
+
+    def test_deadline_edit(self):
+        self.child.deadline = None
+        self.child.update_cached_values()
+        self.assertEqual(self.root.counts.overdue, 0)
+        self.assertCountsFresh()
+
+    def test_remove_and_insert(self):
+        self.parent.remove()
+        self.assertEqual(self.root.counts, TaskCounts(total=1))
+        self.root.find_subtask("Other").insert_subtask(self.parent)
+        self.assertEqual(self.root.counts, TaskCounts(total=3, overdue=1))
+        self.assertCountsFresh()
+
+
+class TaskIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = TaskNode()
+        self.root.id = 0
+        for index in range(100):
+            self.root.add_subtask(TaskNode(f"Task {index}"))
+        self.task = self.root.find_subtask("Task 42")
+        self.task.add_subtask(TaskNode("-Subtask-"))
+
+    def test_find_subtask(self):
+        self.assertIs(self.root.find_subtask("Subtask"), self.task.find_subtask("Subtask"))
+        self.assertFalse(self.root.find_subtask("Task 0").find_subtask("Subtask"))
+        self.assertFalse(self.root.add_subtask(TaskNode("Task 42")))
+        self.assertEqual(len(self.root.child_nodes), 100)
+
+    def test_find_by_id(self):
+        subtask = self.task.find_subtask("Subtask")
+        self.assertIs(self.root.find_by_id(subtask.id), subtask)
+        self.assertIs(self.root.find_by_id(0), self.root)
+        self.assertIsNone(self.root.find_subtask("Task 0").find_by_id(subtask.id))
+
+    def test_edit_and_remove(self):
+        self.task.text = "Renamed"
+        self.assertIs(self.root.find_subtask("Renamed"), self.task)
+        self.assertFalse(self.root.find_subtask("Task 42"))
+
+        subtask = self.task.find_subtask("Subtask")
+        self.task.remove()
+        self.assertFalse(self.root.find_subtask("Subtask"))
+        self.assertIsNone(self.root.find_by_id(subtask.id))
+        self.assertIs(self.task.find_subtask("Subtask"), subtask)
+
+        self.root.find_subtask("Task 0").insert_subtask(self.task)
+        self.assertIs(self.root.find_subtask("Subtask"), subtask)
+        # Only the root node keeps the indexes of the tree
+        self.assertIsNone(self.task._indexes)
+        self.assertIsNotNone(self.root._indexes)
+
+    def test_identity(self):
+        first = self.root.find_subtask("Task 0")
+        second = TaskNode("Task 0")
+        self.root.find_subtask("Task 1").insert_subtask(second)
+        self.assertNotEqual(first, second)
+        self.assertEqual(first, TaskNode("Other text", task_id=first.id))
+        self.assertEqual(len({first, second, self.root.find_by_id(first.id)}), 2)
+        self.assertNotEqual(TaskNode("Task"), TaskNode("Task"))
+
+
+class TaskOrderTestCase(unittest.TestCase):
+    def test_insert_keeps_order(self):
+        root = TaskNode()
+        root.id = 0
+        today = datetime.date.today()
+        for index in range(50):
+            deadline = today + datetime.timedelta(days=index % 7) if index % 3 == 0 else None
+            root.insert_subtask(TaskNode(f"Task {index % 10}", deadline, importance=14 + index % 3))
+        inserted = list(root.child_nodes)
+        root.sort_children()
+        self.assertEqual([task.id for task in inserted], [task.id for task in root.child_nodes])
+
+    def test_reposition(self):
+        root = TaskNode()
+        root.id = 0
+        for text in ("A", "B", "C"):
+            root.add_subtask(TaskNode(text))
+        root.find_subtask("A").set_done()
+        self.assertEqual([task.text for task in root.child_nodes], ["B", "C", "A"])
+        root.find_subtask("C").text = "0"
+        root.reposition_subtask(root.find_subtask("0"))
+        self.assertEqual([task.text for task in root.child_nodes], ["0", "B", "A"])
+
+
+class TaskDeadlineTestCase(unittest.TestCase):
+    def setUp(self):
+        self.today = datetime.date.today()
+        self.root = TaskNode()
+        self.root.id = 0
+        for index in range(20):
+            deadline = self.today + datetime.timedelta(days=index - 6) if index % 2 == 0 else None
+            self.root.add_subtask(TaskNode(f"Task {index}", deadline))
+        self.parent = self.root.find_subtask("Task 1")
+        self.parent.add_subtask(TaskNode("Subtask", self.today))
+
+    def test_queries(self):
+        self.assertEqual({task.text for task in self.root.due_on(self.today)}, {"Task 6", "Subtask"})
+        self.assertEqual([task.text for task in self.parent.due_on(self.today)], ["Subtask"])
+        self.assertEqual([task.text for task in self.root.overdue()], ["Task 0", "Task 2", "Task 4"])
+        self.assertEqual(len(self.root.due_between(self.today, self.today + datetime.timedelta(days=4))), 4)
+        self.assertEqual(len(self.root.due_between(None, None)), 11)
+        self.root.find_subtask("Task 8").set_done()
+        self.assertEqual([task.text for task in self.root.next_due(2, self.today + datetime.timedelta(days=1))],
+                         ["Task 10", "Task 12"])
+
+    def test_updates(self):
+        task = self.root.find_subtask("Task 3")
+        task.deadline = self.today
+        self.assertIn(task, self.root.due_on(self.today))
+        task.deadline = None
+        self.assertNotIn(task, self.root.due_on(self.today))
+
+        self.parent.remove()
+        self.assertEqual([task.text for task in self.root.due_on(self.today)], ["Task 6"])
+        self.assertEqual([task.text for task in self.parent.due_on(self.today)], ["Subtask"])
+        self.root.find_subtask("Task 0").insert_subtask(self.parent)
+        self.assertEqual(len(self.root.due_on(self.today)), 2)
+
+
+class TaskTraversalTestCase(unittest.TestCase):
+    def setUp(self):
+        self.root = TaskNode()
+        self.root.id = 0
+        parent = self.root
+        for depth in range(1100):
+            child = TaskNode(f"Level {depth}", deadline=datetime.date(2030, 1, 1) if depth % 2 else None)
+            parent.append_subtask(child)
+            parent = child
+
+    def test_deep_tree(self):
+        self.assertEqual(len(self.root.get_all_children()), 1100)
+        self.assertEqual(self.root.get_tree().count("\n"), 1100)
+
+    def test_filters(self):
+        self.assertEqual(len(self.root.get_all_children(with_deadline_only=True)), 550)
+        self.assertEqual([task.text for task in self.root.iter_subtree(include_self=False, max_depth=2)], ["Level 0", "Level 1"])
+        level = self.root.find_subtask("Level 1050")
+        level.set_done()
+        self.assertEqual(len(list(self.root.iter_subtree(skip_excluded=False))), 1101)
+        self.assertEqual(len(list(self.root.iter_subtree(include_self=False, prune_excluded=True))), 1050)
+
+    def test_set_done_deep_tree(self):
+        self.root.child_nodes[0].set_done()
+        self.assertEqual(self.root.counts.done, 1100)
+        self.root.child_nodes[0].toggle_done()
+        self.assertEqual(self.root.counts.done, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,31 +1,257 @@
 import datetime
+import random
 import unittest
 
+from OutlinerApp.Backend.intervalIndex import IntervalIndex
+from OutlinerApp.Backend.tasks import TaskNode
+from OutlinerApp.Backend.timetables import Timetable, TimetableItem
+
 
 class MyTestCase(unittest.TestCase):
     def test_timetable_addition(self):
         timetable = Timetable()
         start_time = datetime.datetime.now()
-        new_item = TimeTableItem(start_time,start_time, "Test")
+        new_item = TimetableItem(start_time.date(), "Test", start_time=start_time.time())
 
         timetable.add_item(new_item)
 
-        print(timetable.daytables_by_date)
         self.assertEqual(timetable.daytables_by_date[start_time.date()][0], new_item)
 
     def test_timetable_ordered_addition(self):
         timetable = Timetable()
         start_time_1 = datetime.datetime.now().replace(hour=10)
-        new_item_1 = TimeTableItem(start_time_1, start_time_1, "Test")
+        new_item_1 = TimetableItem(start_time_1.date(), "Test", start_time=start_time_1.time())
 
         start_time_2 = datetime.datetime.now().replace(hour=5)
-        new_item_2 = TimeTableItem(start_time_2, start_time_1, "Test")
+        new_item_2 = TimetableItem(start_time_2.date(), "Test", start_time=start_time_2.time())
 
         timetable.add_item(new_item_1)
         timetable.add_item(new_item_2)
 
-        print(timetable.daytables_by_date)
-        self.assertEqual(timetable.daytables_by_date[start_time_1.date()][0], new_item_2)
+        self.assertIs(timetable.daytables_by_date[start_time_1.date()][0], new_item_2)
+
+    def test_all_day_items_first(self):
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        event = TimetableItem(date, "Event", start_time=datetime.time(9))
+        all_day = TimetableItem(date, "All day")
+        task = TimetableItem.from_task_with_deadline(TaskNode("Task", date))
+        for item in (event, all_day, task):
+            timetable.add_item(item)
+        self.assertEqual([item.name for item in timetable.daytables_by_date[date]], ["All day", "Task", "Event"])
+
+    def test_random_order(self):
+        random.seed(0)
+        timetable = Timetable()
+        items = []
+        for index in range(500):
+            start_time = datetime.time(random.randrange(24), random.choice((0, 30))) if index % 5 else None
+            items.append(TimetableItem(datetime.date(2030, 1, 1 + index % 3), f"Event {index}", start_time=start_time))
+        for item in items:
+            timetable.add_item(item)
+        timetable.check_invariants()
+
+        random.shuffle(items)
+        for item in items[:250]:
+            self.assertIs(timetable.remove_item(item), item)
+        timetable.check_invariants()
+        self.assertEqual(sum(len(day) for day in timetable.daytables_by_date.values()), 250)
+        self.assertIsNone(timetable.remove_item(items[0]))
+
+        timetable.move_item(items[300], datetime.date(2030, 2, 1))
+        timetable.check_invariants()
+        self.assertIs(timetable.find_item(datetime.date(2030, 2, 1), 0), items[300])
+
+    def test_date_range(self):
+        timetable = Timetable()
+        items = [TimetableItem(datetime.date(2030, 1, day), f"Event {day} {hour}", start_time=datetime.time(hour))
+                 for day in (20, 1, 10, 31) for hour in (15, 9)]
+        all_day = TimetableItem(datetime.date(2030, 1, 10), "All day")
+        for item in items + [all_day]:
+            timetable.add_item(item)
+
+        self.assertEqual([date.day for date, _ in timetable.iter_days()], [1, 10, 20, 31])
+        self.assertEqual([item.name for item in timetable.items_between(datetime.date(2030, 1, 5),
+                                                                        datetime.date(2030, 1, 20))],
+                         ["All day", "Event 10 9", "Event 10 15", "Event 20 9", "Event 20 15"])
+        self.assertEqual(len(timetable.items_between(datetime.date(2030, 2, 1))), 0)
+        self.assertEqual([item.name for item in timetable.next_items(3, datetime.datetime(2030, 1, 10, 12))],
+                         ["All day", "Event 10 15", "Event 20 9"])
+        self.assertEqual(len(timetable.next_items(10, datetime.datetime(2030, 1, 31, 9))), 2)
+
+        meeting = TimetableItem(datetime.date(2030, 1, 31), "Meeting", start_time=datetime.time(9),
+                                end_time=datetime.time(17))
+        night = TimetableItem(datetime.date(2030, 1, 31), "Night", start_time=datetime.time(22),
+                              end_time=datetime.time(2))
+        timetable.add_item(meeting)
+        timetable.add_item(night)
+        self.assertEqual([item.name for item in timetable.next_items(10, datetime.datetime(2030, 1, 31, 10))],
+                         ["Meeting", "Event 31 15", "Night"])
+        self.assertEqual(timetable.next_items(10, datetime.datetime(2030, 2, 1, 1)), [night])
+        timetable.remove_item(meeting)
+        timetable.remove_item(night)
+
+        for item in items[:2]:
+            timetable.remove_item(item)
+        self.assertNotIn(datetime.date(2030, 1, 20), timetable.daytables_by_date)
+        self.assertEqual([date.day for date, _ in timetable.iter_days(end=datetime.date(2030, 1, 20))], [1, 10])
+        timetable.check_invariants()
+
+    def test_overlaps(self):
+        random.seed(0)
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        for index in range(300):
+            start = random.randrange(24 * 4) * 15
+            end = min(start + random.choice((0, 15, 30, 60, 90)), 24 * 60 - 1)
+            timetable.add_item(TimetableItem(date, f"Event {index}", start_time=datetime.time(*divmod(start, 60)),
+                                             end_time=datetime.time(*divmod(end, 60))))
+        timetable.add_item(TimetableItem(date, "All day"))
+        for start, end in ((datetime.time(14), datetime.time(15, 30)), (datetime.time(9), None),
+                           (datetime.time(0), datetime.time(23, 59))):
+            moment = end is None or start == end
+            expected = [item for item in timetable.daytables_by_date[date] if item.start_time is not None and
+                        (start <= item.start_time < end if not moment else item.start_time == start)
+                        or item.start_time is not None and item.start_time < start < item.end_time
+                        or item.start_time is not None and item.start_time == start]
+            found = timetable.overlapping(date, start, end)
+            self.assertEqual(sorted(item.TID for item in found), sorted(item.TID for item in expected))
+            self.assertEqual([item.start_time for item in found], sorted(item.start_time for item in found))
+
+    def test_conflicts(self):
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        meeting = TimetableItem(date, "Meeting", start_time=datetime.time(14), end_time=datetime.time(15, 30))
+        reminder = TimetableItem(date, "Reminder", start_time=datetime.time(15))
+        night = TimetableItem(date, "Night shift", start_time=datetime.time(22), end_time=datetime.time(6))
+        for item in (meeting, reminder, night):
+            timetable.add_item(item)
+
+        self.assertEqual(timetable.conflicts(meeting), [reminder])
+        self.assertEqual(timetable.conflicts(TimetableItem(date, "Later", start_time=datetime.time(15, 30))), [])
+        morning = TimetableItem(datetime.date(2030, 1, 2), "Breakfast", start_time=datetime.time(5),
+                                end_time=datetime.time(7))
+        self.assertEqual(timetable.conflicts(morning), [night])
+        timetable.add_item(morning)
+        self.assertEqual(timetable.conflicts(night), [morning])
+        timetable.remove_item(night)
+        self.assertEqual(timetable.conflicts(morning), [])
+
+    def test_intervals_kept_up_to_date(self):
+        random.seed(0)
+        timetable = Timetable()
+        first = datetime.date(2030, 1, 1)
+        items = []
+        for index in range(400):
+            if len(items) > 0 and random.random() < 0.3:
+                timetable.remove_item(items.pop(random.randrange(len(items))))
+            else:
+                item = TimetableItem(first + datetime.timedelta(days=random.randrange(3)), f"Event {index}",
+                                     start_time=datetime.time(random.randrange(24), random.choice((0, 30))),
+                                     end_time=datetime.time(random.randrange(24), random.choice((0, 30))))
+                timetable.add_item(item)
+                items.append(item)
+            probe = TimetableItem(first + datetime.timedelta(days=random.randrange(4)), "Probe",
+                                  start_time=datetime.time(random.randrange(24)),
+                                  end_time=datetime.time(random.randrange(24)))
+            rebuilt = Timetable()
+            for item in sorted(items, key=lambda item: item.TID):
+                rebuilt.add_item(item)
+            self.assertEqual(sorted(item.TID for item in timetable.conflicts(probe)),
+                             sorted(item.TID for item in rebuilt.conflicts(probe)))
+        # Indexes are updated in place, not dropped on every change
+        index = timetable._get_intervals(first)
+        late = TimetableItem(first, "Late", start_time=datetime.time(23), end_time=datetime.time(23, 30))
+        timetable.add_item(late)
+        self.assertIs(timetable._intervals_by_date.get(first), index)
+        self.assertIn(late, timetable.overlapping(first, datetime.time(23, 15)))
+
+    def test_ending_at_midnight(self):
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        late = TimetableItem(date, "Late", start_time=datetime.time(23), end_time=datetime.time(0))
+        timetable.add_item(late)
+        self.assertFalse(late.is_overnight)
+        self.assertEqual(late.duration, datetime.timedelta(hours=1))
+        self.assertEqual(timetable.overlapping(date, datetime.time(23, 30)), [late])
+        next_day = TimetableItem(datetime.date(2030, 1, 2), "Early", start_time=datetime.time(0))
+        self.assertEqual(timetable.conflicts(next_day), [])
+        self.assertEqual(timetable.overlapping(next_day.date, datetime.time(0), datetime.time(1)), [])
+
+    def test_empty_intervals(self):
+        index = IntervalIndex([(0, 0, "empty"), (0, 0, "empty too"), (10, 20, "event")])
+        self.assertEqual([item for _, _, item in index.overlapping(5, 15)], ["event"])
+        self.assertEqual(index.containing(0), [])
+
+    def test_free_slot(self):
+        timetable = Timetable()
+        monday = datetime.date(2030, 1, 7)
+        hour = datetime.timedelta(hours=1)
+        for start, end in ((9, 12), (11, 13), (14, 18)):
+            timetable.add_item(TimetableItem(monday, "Busy", start_time=datetime.time(start),
+                                             end_time=datetime.time(end)))
+        timetable.add_item(TimetableItem(monday, "Reminder", start_time=datetime.time(13, 30)))
+        timetable.add_item(TimetableItem(monday + datetime.timedelta(days=1), "Busy", start_time=datetime.time(9),
+                                         end_time=datetime.time(17, 30)))
+        week = monday, monday + datetime.timedelta(days=6)
+
+        self.assertEqual(timetable.free_slot(hour, *week, datetime.time(9), datetime.time(18)),
+                         datetime.datetime(2030, 1, 7, 13))
+        self.assertEqual(timetable.free_slot(2 * hour, *week, datetime.time(9), datetime.time(18)),
+                         datetime.datetime(2030, 1, 9, 9))
+        self.assertEqual(timetable.free_slot(hour, monday, monday, datetime.time(14), datetime.time(18)), None)
+        self.assertEqual(timetable.free_slot(hour, monday, monday, datetime.time(8)), datetime.datetime(2030, 1, 7, 8))
+
+    def test_tids(self):
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        items = [TimetableItem(date, f"Event {index}") for index in range(3)]
+        for item in items:
+            timetable.add_item(item)
+        self.assertEqual([item.TID for item in items], [1, 2, 3])
+        self.assertIs(timetable.find_by_tid(2), items[1])
+
+        timetable.move_item(items[1], datetime.date(2030, 1, 2))
+        self.assertIs(timetable.find_by_tid(2), items[1])
+        timetable.remove_item(items[2])
+        self.assertIsNone(timetable.find_by_tid(3))
+        timetable.add_item(TimetableItem(date, "Reused TID", TID=1))
+        timetable.add_item(TimetableItem(date, "New TID"))
+        self.assertEqual([item.TID for item in timetable.daytables_by_date[date]], [1, 4, 5])
+        timetable.check_invariants()
+
+    def test_task_index(self):
+        timetable = Timetable()
+        task = TaskNode("Task", datetime.date(2030, 1, 1), task_id=1)
+        item = TimetableItem.from_task_with_deadline(task)
+        timetable.add_item(item)
+        self.assertIs(timetable.find_item(task), item)
+        self.assertIsNone(timetable.find_item(TaskNode("Other", datetime.date(2030, 1, 1), task_id=2)))
+
+        timetable.move_item(item, datetime.date(2030, 1, 2))
+        self.assertIs(timetable.find_item(task), item)
+        timetable.remove_item(datetime.date(2030, 1, 2), 0)
+        self.assertIsNone(timetable.find_item(task))
+        timetable.check_invariants()
+
+    def test_legacy_duplicate_tids(self):
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        timetable.daytables_by_date[date] = [TimetableItem(date, "Second", TID=1), TimetableItem(date, "First", TID=1)]
+        timetable.reindex()
+        self.assertEqual(sorted(item.TID for item in timetable.daytables_by_date[date]), [1, 2])
+        timetable.check_invariants()
+
+    def test_invariant_checker(self):
+        timetable = Timetable()
+        date = datetime.date(2030, 1, 1)
+        first = TimetableItem(date, "First", start_time=datetime.time(9))
+        second = TimetableItem(date, "Second", start_time=datetime.time(10))
+        timetable.add_item(first)
+        timetable.add_item(second)
+        first.start_time = datetime.time(11)
+        with self.assertRaises(AssertionError):
+            timetable.check_invariants()
 
 
 if __name__ == '__main__':